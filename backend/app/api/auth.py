@@ -3,6 +3,9 @@ from fastapi import APIRouter, HTTPException, Response, Request
 from app.models.auth import UnlockRequest, UnlockResponse, LockResponse, StatusResponse
 from app.core.crypto import validate_seed, derive_keys, generate_session_token
 from app.core.database import init_database, set_vault_config, get_vault_config, set_active_db_key, DB_PATH
+from app.api.entity_lists import load_entity_lists
+from app.services.entity_lists import clear_entity_lists
+from app.services import memory_manager, spill_store
 
 router = APIRouter(prefix="/api/auth", tags=["auth"])
 
@@ -36,6 +39,9 @@ async def unlock_vault(request: UnlockRequest, response: Response):
     init_database(keys['db_key'])
     set_vault_config('salt', salt_hex, keys['db_key'])
     set_active_db_key(keys['db_key'])
+    load_entity_lists(keys['db_key'])
+    #evicted documents spill to disk encrypted with this session's key
+    spill_store.set_session_key(keys['session_key'])
     #create session
     session_token = generate_session_token()
     sessions[session_token] = {
@@ -58,6 +64,9 @@ async def lock_vault(request: Request, response: Response):
     if session_token and session_token in sessions:
         del sessions[session_token]
     set_active_db_key(None)
+    clear_entity_lists()
+    #spilled documents become unreadable: wipe them
+    memory_manager.wipe_spilled()
     response.delete_cookie("session_token")
     return LockResponse(status="success", message="Vault locked")
 
@@ -1,6 +1,12 @@
+import asyncio
+import hashlib
+import io
 from fastapi import APIRouter, HTTPException, UploadFile, File
 from app.models.documents import UploadResponse, DocumentInfo
-from app.services.file_handler import validate_file_type, store_document, get_document, list_documents
+from app.services.file_handler import (
+    validate_file_type, validate_magic, store_document, get_document, list_documents,
+    UPLOAD_CHUNK_BYTES, MAX_UPLOAD_BYTES, SNIFF_BYTES
+)
 
 router = APIRouter(prefix="/api/documents", tags=["documents"])
 
@@ -10,10 +16,9 @@ async def upload_document(file: UploadFile = File(...)):
     if not valid:
         raise HTTPException(status_code=400, detail=result)
     file_type = result
-    content = await file.read()
-    if len(content) == 0:
-        raise HTTPException(status_code=400, detail="Empty file")
-    doc = store_document(file.filename or "unknown", content, file_type)
+    content, sha256 = await _read_upload(file, file_type)
+    #off the event loop: storing may spill other documents to disk
+    doc = await asyncio.to_thread(store_document, file.filename or "unknown", content, file_type, sha256)
     return UploadResponse(
         document_id=doc.document_id,
         filename=doc.filename,
@@ -22,6 +27,37 @@ async def upload_document(file: UploadFile = File(...)):
         size=doc.size
     )
 
+def _too_large() -> HTTPException:
+    return HTTPException(status_code=413, detail=f"File exceeds {MAX_UPLOAD_BYTES // (1024 * 1024)} MB limit")
+
+async def _read_upload(file: UploadFile, file_type: str) -> tuple[bytes, str]:
+    #one pass in fixed-size chunks: hash incrementally, stop at the size limit,
+    #sniff the type from the first bytes; BytesIO hands its buffer over
+    #without a final copy
+    if file.size is not None and file.size > MAX_UPLOAD_BYTES:
+        raise _too_large()
+    digest = hashlib.sha256()
+    buffer = io.BytesIO()
+    size = 0
+    head = b""
+    while True:
+        chunk = await file.read(UPLOAD_CHUNK_BYTES)
+        if not chunk:
+            break
+        size += len(chunk)
+        if size > MAX_UPLOAD_BYTES:
+            raise _too_large()
+        if len(head) < SNIFF_BYTES:
+            head += chunk[:SNIFF_BYTES - len(head)]
+            valid, result = validate_magic(file_type, head)
+            if not valid:
+                raise HTTPException(status_code=400, detail=result)
+        digest.update(chunk)
+        buffer.write(chunk)
+    if size == 0:
+        raise HTTPException(status_code=400, detail="Empty file")
+    return buffer.getvalue(), digest.hexdigest()
+
 @router.get("/{document_id}", response_model=DocumentInfo)
 async def get_document_info(document_id: str):
     doc = get_document(document_id)
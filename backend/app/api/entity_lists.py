@@ -0,0 +1,29 @@
+from fastapi import APIRouter, HTTPException
+from app.models.entity_lists import EntityLists
+from app.core.database import get_active_db_key, get_preference, set_preference
+from app.services.entity_lists import PREFERENCE_KEY, get_entity_lists, set_entity_lists
+
+router = APIRouter(prefix="/api/entity-lists", tags=["entity-lists"])
+
+def load_entity_lists(db_key: str) -> None:
+    #called on unlock: read the lists from the vault and compile them
+    stored = get_preference(PREFERENCE_KEY, db_key)
+    set_entity_lists(EntityLists.model_validate_json(stored) if stored else EntityLists())
+
+def _require_unlocked() -> str:
+    db_key = get_active_db_key()
+    if db_key is None:
+        raise HTTPException(status_code=401, detail="Vault is locked")
+    return db_key
+
+@router.get("", response_model=EntityLists)
+async def read_entity_lists():
+    _require_unlocked()
+    return get_entity_lists()
+
+@router.put("", response_model=EntityLists)
+async def update_entity_lists(lists: EntityLists):
+    db_key = _require_unlocked()
+    set_preference(PREFERENCE_KEY, lists.model_dump_json(), db_key)
+    set_entity_lists(lists)
+    return lists
@@ -1,7 +1,41 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Response
+from app.models.health import ReadinessResponse
+from app.services import detection_cache, detection_executor, language_router, memory_manager
+from app.services.warmup import is_ready, get_component_status
 
 router = APIRouter()
 
+#liveness: process is up (models may still be loading)
 @router.get("/health")
 async def health():
-    return {"status": "ok"}
+    return {"status": "ok", "ready": is_ready()}
+
+#readiness: 503 until every component has loaded and answered a warm-up call
+@router.get("/ready", response_model=ReadinessResponse)
+async def ready(response: Response):
+    ready = is_ready()
+    if not ready:
+        response.status_code = 503
+    return ReadinessResponse(ready=ready, components=get_component_status())
+
+#hit-rate of the paragraph-level PII cache, summed over this process and
+#the analyzer pool workers (they report their counters with each result)
+@router.get("/health/detection-cache")
+async def detection_cache_stats():
+    return detection_cache.get_stats()
+
+#detection concurrency and event-loop lag (stays low while documents sanitize)
+@router.get("/health/detection")
+async def detection_stats():
+    return detection_executor.get_stats()
+
+#spaCy models resident in this process and the memory budget they share
+@router.get("/health/languages")
+async def language_stats():
+    return {**language_router.get_stats(), "models": language_router.list_loaded()}
+
+#bytes held per store (and per document with ?documents=true), gate
+#fingerprints and process RSS / peak RSS, for sizing containers and leaks
+@router.get("/health/memory")
+async def memory_usage(documents: bool = False):
+    return memory_manager.get_memory_usage(per_document=documents)
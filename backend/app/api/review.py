@@ -2,7 +2,7 @@ from fastapi import APIRouter, HTTPException
 from typing import List
 from pydantic import BaseModel
 from app.models.review import ReviewChunk, ReviewQueueResponse, RedactionInfo
-from app.services.memory_manager import list_sanitized_documents, get_sanitized_content
+from app.services.memory_manager import list_sanitized_documents, get_sanitized_record
 from app.services.review_manager import (
     get_chunk_status, approve_chunk, reject_chunk,
     bulk_approve, bulk_reject, get_status_counts
@@ -33,22 +33,25 @@ async def get_review_queue():
     doc_ids = list_sanitized_documents()
     chunks: List[ReviewChunk] = []
     for doc_id in doc_ids:
-        redaction_map = get_sanitized_content(doc_id)
-        if not redaction_map:
+        record = get_sanitized_record(doc_id)
+        if not record:
             continue
         #extract redaction info for highlighting (no original text exposed)
+        #read from the entity columns, original values are never materialized
+        #one entry per placeholder (interned placeholders repeat in the text)
+        table = record.entities
         redactions = [
             RedactionInfo(
-                placeholder=entity.placeholder,
-                entity_type=entity.entity_type,
-                source=entity.source
+                placeholder=table.placeholder(i),
+                entity_type=table.entity_type(i),
+                source=table.source(i)
             )
-            for entity in redaction_map.entities
+            for i in table.first_index_by_placeholder()
         ]
         chunks.append(ReviewChunk(
             chunk_id=doc_id,
             document_id=doc_id,
-            redacted_text=redaction_map.redacted_text,
+            redacted_text=record.redacted_text,
             redactions=redactions,
             status=get_chunk_status(doc_id)
         ))
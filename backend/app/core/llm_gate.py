@@ -1,12 +1,26 @@
 import hashlib
 import re
-from typing import Set, Optional
+from typing import Dict, List, Set, Optional
 from pydantic import BaseModel
+from app.core.memory import str_bytes
+from app.core.text_index import TextIndex, get_index
 
 #document content fingerprints for tracking
 _document_hashes: Set[str] = set()
 _document_substrings: Set[str] = set()
 _redaction_placeholders: Set[str] = set()
+_registries = {
+    "document_hashes": _document_hashes,
+    "document_substrings": _document_substrings,
+    "redaction_placeholders": _redaction_placeholders
+}
+#payload bytes of the three sets, kept up to date on insert and unregister
+_registry_bytes = dict.fromkeys(_registries, 0)
+#fingerprints each document registered (None: registered without a document
+#id) and their payload bytes; a shared fingerprint counts for every holder
+#and leaves the sets with its last one
+_document_fingerprints: Dict[Optional[str], Dict[str, Set[str]]] = {}
+_document_registry_bytes: Dict[Optional[str], Dict[str, int]] = {}
 
 #minimum substring length to track (too short = false positives)
 MIN_SUBSTRING_LEN = 20
@@ -26,50 +40,94 @@ class GateResult(BaseModel):
 def _compute_hash(text: str) -> str:
     return hashlib.sha256(text.encode('utf-8')).hexdigest()
 
-def _extract_substrings(text: str, min_len: int = MIN_SUBSTRING_LEN) -> Set[str]:
+def _extract_substrings(
+    text: str,
+    min_len: int = MIN_SUBSTRING_LEN,
+    index: Optional[TextIndex] = None
+) -> Set[str]:
     #extract meaningful substrings from text
-    #split on whitespace and newlines, take chunks of min_len or more
+    #whitespace-normalized runs of tokens, take chunks of min_len or more
     substrings = set()
-    #normalize whitespace
-    normalized = ' '.join(text.split())
-    #sliding window for significant chunks
-    words = normalized.split()
-    for i in range(len(words)):
+    index = get_index(text, index)
+    starts = index.token_starts
+    ends = index.token_ends
+    #sliding window for significant chunks (grown one token at a time)
+    for i in range(len(starts)):
         chunk = ''
-        for j in range(i, len(words)):
-            chunk = ' '.join(words[i:j+1])
+        for j in range(i, len(starts)):
+            word = text[starts[j]:ends[j]]
+            chunk = chunk + ' ' + word if chunk else word
             if len(chunk) >= min_len:
                 substrings.add(chunk.lower())
                 if len(chunk) > 100:
                     break
     return substrings
 
-def register_document_content(text: str) -> None:
+def _add(name: str, values, doc_id: Optional[str]) -> None:
+    registry = _registries[name]
+    held = _document_fingerprints.setdefault(doc_id, {}).setdefault(name, set())
+    sizes = _document_registry_bytes.setdefault(doc_id, dict.fromkeys(_registries, 0))
+    for value in values:
+        if value in held:
+            continue
+        size = str_bytes(value)
+        held.add(value)
+        sizes[name] += size
+        if value not in registry:
+            registry.add(value)
+            _registry_bytes[name] += size
+
+def register_document_content(
+    text: str,
+    index: Optional[TextIndex] = None,
+    doc_id: Optional[str] = None
+) -> None:
     #register document text for gate tracking
     if not text or len(text.strip()) == 0:
         return
-    _document_hashes.add(_compute_hash(text))
+    _add("document_hashes", [_compute_hash(text)], doc_id)
     #add significant substrings
-    substrings = _extract_substrings(text)
-    _document_substrings.update(substrings)
+    substrings = _extract_substrings(text, index=index)
+    _add("document_substrings", substrings, doc_id)
 
-def register_redaction_placeholder(placeholder: str) -> None:
+def register_redaction_placeholder(placeholder: str, doc_id: Optional[str] = None) -> None:
     #track redaction placeholders (e.g. [EMAIL_ADDRESS_1])
     if placeholder:
-        _redaction_placeholders.add(placeholder)
+        _add("redaction_placeholders", [placeholder], doc_id)
 
-def register_from_redaction_map(redaction_map) -> None:
+def register_from_redaction_map(redaction_map, doc_id: Optional[str] = None) -> None:
     #register both original text and track placeholders
     if hasattr(redaction_map, 'original_text'):
-        register_document_content(redaction_map.original_text)
+        register_document_content(redaction_map.original_text, doc_id=doc_id)
     if hasattr(redaction_map, 'entities'):
+        seen: Set[str] = set()
         for entity in redaction_map.entities:
+            #interned placeholders repeat; register each placeholder/value once
+            key = getattr(entity, 'placeholder', None)
+            if key:
+                if key in seen:
+                    continue
+                seen.add(key)
             if hasattr(entity, 'placeholder') and entity.placeholder:
-                register_redaction_placeholder(entity.placeholder)
+                register_redaction_placeholder(entity.placeholder, doc_id)
             if hasattr(entity, 'original_text') and entity.original_text:
                 #register PII/secret values themselves
                 if len(entity.original_text) >= 8:
-                    _document_substrings.add(entity.original_text.lower())
+                    _add("document_substrings", [entity.original_text.lower()], doc_id)
+
+def unregister_document(doc_id: str) -> None:
+    #drops a document's fingerprints, except those another holder still has
+    held = _document_fingerprints.pop(doc_id, None)
+    _document_registry_bytes.pop(doc_id, None)
+    if not held:
+        return
+    for name, values in held.items():
+        registry = _registries[name]
+        others = [fingerprints[name] for fingerprints in _document_fingerprints.values() if name in fingerprints]
+        for value in values:
+            if not any(value in other for other in others):
+                registry.discard(value)
+                _registry_bytes[name] -= str_bytes(value)
 
 def _check_exact_hash_match(text: str) -> bool:
     return _compute_hash(text) in _document_hashes
@@ -155,6 +213,10 @@ def clear_registry() -> None:
     _document_hashes.clear()
     _document_substrings.clear()
     _redaction_placeholders.clear()
+    _document_fingerprints.clear()
+    _document_registry_bytes.clear()
+    for name in _registry_bytes:
+        _registry_bytes[name] = 0
 
 def get_registry_stats() -> dict:
     return {
@@ -162,3 +224,15 @@ def get_registry_stats() -> dict:
         "document_substrings": len(_document_substrings),
         "redaction_placeholders": len(_redaction_placeholders)
     }
+
+def get_registry_bytes() -> dict:
+    #fingerprint payload bytes per set (memory accounting)
+    return {**_registry_bytes, "total": sum(_registry_bytes.values())}
+
+def get_document_registry_bytes(doc_id: str) -> dict:
+    #fingerprint payload bytes one document registered, shared ones included
+    sizes = _document_registry_bytes.get(doc_id) or dict.fromkeys(_registries, 0)
+    return {**sizes, "total": sum(sizes.values())}
+
+def list_registered_documents() -> List[str]:
+    return [doc_id for doc_id in _document_fingerprints if doc_id is not None]
@@ -0,0 +1,47 @@
+import sys
+from typing import Dict, Optional
+
+try:
+    import resource
+except ImportError:
+    #windows
+    resource = None
+
+_PROC_STATUS = "/proc/self/status"
+#VmRSS: resident now, VmHWM: peak resident ("high water mark")
+_PROC_FIELDS = {"VmRSS": "rss_bytes", "VmHWM": "rss_peak_bytes"}
+#object header (and terminator) of an ascii and a non-ascii compact str
+_ASCII_OVERHEAD = sys.getsizeof("")
+_COMPACT_OVERHEAD = sys.getsizeof("\xe9") - 1
+
+def str_bytes(text: str) -> int:
+    #chars stored by CPython (1, 2 or 4 bytes each, plus a cached utf-8 copy
+    #if one was made), read off the object size in O(1)
+    if not text:
+        return 0
+    return sys.getsizeof(text) - (_ASCII_OVERHEAD if text.isascii() else _COMPACT_OVERHEAD)
+
+def _read_proc_status() -> Optional[Dict[str, int]]:
+    try:
+        with open(_PROC_STATUS) as f:
+            lines = f.readlines()
+    except OSError:
+        return None
+    result = {}
+    for line in lines:
+        name, _, value = line.partition(":")
+        if name in _PROC_FIELDS:
+            #reported in kB
+            result[_PROC_FIELDS[name]] = int(value.split()[0]) * 1024
+    return result
+
+def process_memory() -> Dict[str, Optional[int]]:
+    #resident set size of this process, current and peak
+    status = _read_proc_status()
+    if status:
+        return {"rss_bytes": status.get("rss_bytes"), "rss_peak_bytes": status.get("rss_peak_bytes")}
+    if resource is None:
+        return {"rss_bytes": None, "rss_peak_bytes": None}
+    #no procfs (macOS): only the peak is available, in bytes there and kB elsewhere
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {"rss_bytes": None, "rss_peak_bytes": peak if sys.platform == "darwin" else peak * 1024}
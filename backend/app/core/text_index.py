@@ -0,0 +1,87 @@
+import re
+from array import array
+from typing import Iterator, List, Optional, Tuple
+
+#one scan finds whitespace tokens and blank-line paragraph breaks (disjoint:
+#a break is all whitespace, a token has none)
+_TOKEN_OR_BREAK = re.compile(r'(\n\s*\n)|\S+')
+#a sentence ends at the first of a run of terminators (same as [^.!?]+[.!?])
+_SENTENCE_END = re.compile(r'(?<=[^.!?])[.!?]')
+#characters sampled (head, tail, strided) to tell texts of equal length apart
+_SAMPLE_CHARS = 64
+
+def _sample(text: str) -> Tuple[str, str, str]:
+    step = max(1, len(text) // _SAMPLE_CHARS)
+    return text[:_SAMPLE_CHARS], text[-_SAMPLE_CHARS:], text[::step]
+
+class TextIndex:
+    #token, sentence and paragraph offsets of one document, built once and
+    #shared by every detection stage; holds offsets only, never the text
+    #(plus a ~200 char sample): callers pass the index of the exact text
+    __slots__ = ("length", "sample", "token_starts", "token_ends", "paragraph_starts", "paragraph_ends", "sentence_ends")
+
+    def __init__(self, text: str):
+        self.length = len(text)
+        self.sample = _sample(text)
+        self.token_starts = array('q')
+        self.token_ends = array('q')
+        self.paragraph_starts = array('q')
+        self.paragraph_ends = array('q')
+        self.sentence_ends = array('q')
+        paragraph_start = 0
+        for match in _TOKEN_OR_BREAK.finditer(text):
+            if match.group(1) is None:
+                self.token_starts.append(match.start())
+                self.token_ends.append(match.end())
+                continue
+            self.paragraph_starts.append(paragraph_start)
+            self.paragraph_ends.append(match.start())
+            paragraph_start = match.end()
+        self.paragraph_starts.append(paragraph_start)
+        self.paragraph_ends.append(len(text))
+        for match in _SENTENCE_END.finditer(text):
+            self.sentence_ends.append(match.end())
+
+    def matches(self, text: str) -> bool:
+        #cheap guard against an index built for another text: length plus
+        #sampled characters (O(1) in the text size, not a full comparison)
+        return self.length == len(text) and self.sample == _sample(text)
+
+    @property
+    def token_count(self) -> int:
+        return len(self.token_starts)
+
+    @property
+    def sentence_count(self) -> int:
+        return len(self.sentence_ends)
+
+    def iter_tokens(self, min_len: int = 0) -> Iterator[Tuple[int, int]]:
+        #(start, end) of whitespace-separated tokens, optionally only long ones
+        for start, end in zip(self.token_starts, self.token_ends):
+            if end - start >= min_len:
+                yield start, end
+
+    def total_token_chars(self) -> int:
+        return sum(self.token_ends) - sum(self.token_starts)
+
+    def paragraph_bounds(self) -> List[Tuple[int, int]]:
+        #every paragraph between blank lines, including blank ones
+        return list(zip(self.paragraph_starts, self.paragraph_ends))
+
+    def paragraph_count(self) -> int:
+        #paragraphs containing at least one token
+        count = 0
+        tokens = self.token_starts
+        t = 0
+        for start, end in zip(self.paragraph_starts, self.paragraph_ends):
+            while t < len(tokens) and tokens[t] < start:
+                t += 1
+            if t < len(tokens) and tokens[t] < end:
+                count += 1
+        return count
+
+def get_index(text: str, index: Optional[TextIndex] = None) -> TextIndex:
+    #reuse the caller's index when it belongs to this text, else build one
+    if index is not None and index.matches(text):
+        return index
+    return TextIndex(text)
@@ -1,11 +1,28 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from app.api.health import router as health_router
 from app.api.auth import router as auth_router
 from app.api.documents import router as documents_router
 from app.api.review import router as review_router
+from app.api.entity_lists import router as entity_lists_router
+from app.services import analyzer_pool, detection_executor, spill_store, warmup
 
-app = FastAPI(title="SiftLocal")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    #multi-process PII detection is opt-in (SIFTLOCAL_ANALYZER_WORKERS > 0)
+    if analyzer_pool.ANALYZER_WORKERS > 0:
+        analyzer_pool.start_pool()
+    #load models in the background; /ready reports 503 until done
+    warmup.start_warmup()
+    detection_executor.start_lag_monitor()
+    yield
+    detection_executor.shutdown()
+    analyzer_pool.shutdown_pool()
+    spill_store.wipe_all()
+
+app = FastAPI(title="SiftLocal", lifespan=lifespan)
 app.include_router(health_router)
 app.include_router(auth_router)
 app.include_router(documents_router)
 app.include_router(review_router)
+app.include_router(entity_lists_router)
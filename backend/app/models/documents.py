@@ -17,4 +17,4 @@ class DocumentInfo(BaseModel):
     file_type: str
     sha256: str
     size: int
-    status: Literal["uploaded", "parsing", "parsed", "error"]
+    status: Literal["uploaded", "parsing", "parsed", "error", "evicted"]
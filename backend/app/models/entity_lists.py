@@ -0,0 +1,14 @@
+from pydantic import BaseModel, Field
+from typing import List
+
+class DenyTerm(BaseModel):
+    term: str = Field(..., min_length=1)
+    #entity type of the forced redaction (placeholder becomes [ENTITY_TYPE_n]);
+    #upper-case word characters only so placeholders stay rehydratable
+    entity_type: str = Field("DENY_LIST", pattern=r"^[A-Z0-9_]+$")
+
+class EntityLists(BaseModel):
+    #known-safe values: detected entities inside a match are not redacted
+    allow: List[str] = []
+    #known-sensitive terms: always redacted, even when no detector fires
+    deny: List[DenyTerm] = []
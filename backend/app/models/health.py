@@ -0,0 +1,11 @@
+from pydantic import BaseModel
+from typing import Dict, Literal, Optional
+
+class ComponentStatus(BaseModel):
+    state: Literal["pending", "loading", "ready", "error"] = "pending"
+    load_seconds: Optional[float] = None
+    error: Optional[str] = None
+
+class ReadinessResponse(BaseModel):
+    ready: bool
+    components: Dict[str, ComponentStatus]
@@ -11,6 +11,15 @@ class DetectedEntity(BaseModel):
     original_text: str
     placeholder: str
 
+class RedactedSegment(BaseModel):
+    #one segment of a streamed redaction (see redaction.StreamingRedactor)
+    index: int
+    #position of the segment in the full original text
+    offset: int
+    redacted_text: str
+    #entity offsets are relative to the full original text
+    entities: List[DetectedEntity]
+
 class RedactionMap(BaseModel):
     original_text: str
     redacted_text: str
@@ -0,0 +1,151 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import List, Optional
+
+#worker processes for PII detection (0 = analyze in the API process)
+ANALYZER_WORKERS = int(os.environ.get("SIFTLOCAL_ANALYZER_WORKERS", "0"))
+#jobs allowed in flight before callers wait (default 4 per worker)
+MAX_PENDING_PER_WORKER = 4
+#imported by the forkserver so workers fork with the model already resident
+PRELOAD_MODULE = "app.services.analyzer_preload"
+
+_executor: Optional[ProcessPoolExecutor] = None
+_slots: Optional[threading.BoundedSemaphore] = None
+_workers = 0
+
+def _init_worker() -> None:
+    #no-op when the forkserver preloaded the analyzer, loads it otherwise
+    from app.services import sanitizer
+    sanitizer.load_profile()
+
+def _run_detect_pii(
+    text: str,
+    score_threshold: float,
+    profile: Optional[str],
+    use_cache: bool,
+    language: str
+):
+    #each worker keeps its own detection cache and loaded language models;
+    #its cache counters travel back with the result for /health/detection-cache
+    from app.services import detection_cache, sanitizer
+    before = detection_cache.get_counters()
+    #the worker builds its own TextIndex: pickling one costs more than the text
+    entities = sanitizer._detect_pii_local(text, score_threshold, profile, use_cache, language)
+    return entities, os.getpid(), detection_cache.counters_since(before)
+
+def _collect(result):
+    entities, pid, cache_counters = result
+    from app.services import detection_cache
+    detection_cache.add_worker_counters(pid, cache_counters)
+    return entities
+
+def _run_detect_pii_batch(
+    texts: List[str],
+    score_threshold: float,
+    batch_size: int,
+    profile: Optional[str],
+    language: str
+):
+    from app.services import sanitizer
+    return sanitizer._detect_pii_batch_local(texts, score_threshold, batch_size, profile, language)
+
+def is_running() -> bool:
+    return _executor is not None
+
+def get_worker_count() -> int:
+    return _workers
+
+def start_pool(workers: Optional[int] = None, max_pending: Optional[int] = None) -> None:
+    global _executor, _slots, _workers
+    if _executor is not None:
+        return
+    workers = workers or ANALYZER_WORKERS or os.cpu_count() or 1
+    ctx = multiprocessing.get_context("forkserver")
+    #forkserver imports the preload module (loading the model) before forking
+    #workers, so model pages are shared copy-on-write instead of loaded N times
+    ctx.set_forkserver_preload([PRELOAD_MODULE])
+    _slots = threading.BoundedSemaphore(max_pending or workers * MAX_PENDING_PER_WORKER)
+    _executor = ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_worker)
+    _workers = workers
+
+def shutdown_pool() -> None:
+    global _executor, _slots, _workers
+    if _executor is None:
+        return
+    _executor.shutdown(wait=True, cancel_futures=True)
+    _executor = None
+    _slots = None
+    _workers = 0
+
+def _submit_with_slot(executor: ProcessPoolExecutor, slots: threading.BoundedSemaphore, fn, *args) -> Future:
+    #caller holds a queue slot; it is released when the job finishes
+    try:
+        future = executor.submit(fn, *args)
+    except BaseException:
+        slots.release()
+        raise
+    future.add_done_callback(lambda _: slots.release())
+    return future
+
+def _submit(fn, *args) -> Future:
+    #blocks while max_pending jobs are in flight (bounded queue)
+    executor, slots = _executor, _slots
+    if executor is None:
+        raise RuntimeError("Analyzer pool is not running")
+    slots.acquire()
+    return _submit_with_slot(executor, slots, fn, *args)
+
+def detect_pii(
+    text: str,
+    score_threshold: float,
+    profile: Optional[str] = None,
+    use_cache: bool = False,
+    language: str = "en",
+    index=None
+):
+    #index is not sent to the worker (see _run_detect_pii)
+    return _collect(_submit(_run_detect_pii, text, score_threshold, profile, use_cache, language).result())
+
+def detect_pii_batch(
+    texts: List[str],
+    score_threshold: float,
+    batch_size: int,
+    profile: Optional[str] = None,
+    language: str = "en"
+):
+    #one job per batch so batches spread across workers
+    futures = [
+        _submit(_run_detect_pii_batch, texts[i:i + batch_size], score_threshold, batch_size, profile, language)
+        for i in range(0, len(texts), batch_size)
+    ]
+    results = []
+    for future in futures:
+        results.extend(future.result())
+    return results
+
+async def detect_pii_async(
+    text: str,
+    score_threshold: float,
+    profile: Optional[str] = None,
+    use_cache: bool = False,
+    language: str = "en",
+    index=None
+):
+    #wait for a queue slot off the event loop, then await the worker result;
+    #the pool is captured up front since shutdown_pool may run while we wait
+    executor, slots = _executor, _slots
+    if executor is None:
+        raise RuntimeError("Analyzer pool is not running")
+    acquire = asyncio.ensure_future(asyncio.to_thread(slots.acquire))
+    try:
+        await asyncio.shield(acquire)
+    except asyncio.CancelledError:
+        #the thread still takes the slot: hand it back once it has
+        acquire.add_done_callback(lambda f: f.exception() is None and slots.release())
+        raise
+    return _collect(await asyncio.wrap_future(
+        _submit_with_slot(executor, slots, _run_detect_pii, text, score_threshold, profile, use_cache, language)
+    ))
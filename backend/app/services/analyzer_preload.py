@@ -0,0 +1,5 @@
+#preloaded by the analyzer pool's forkserver (see analyzer_pool.start_pool)
+#loading the model here means every forked worker shares its pages
+from app.services import sanitizer
+
+sanitizer.load_profile()
@@ -0,0 +1,100 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+#max cached segments (LRU beyond this)
+PII_CACHE_SIZE = int(os.environ.get("SIFTLOCAL_PII_CACHE_SIZE", "4096"))
+#bump whenever detection output could change so stale spans are never reused
+DETECTOR_VERSION = "1"
+
+#(start, end, entity_type, score) relative to the normalized segment
+#only spans are kept, never the segment text itself
+CachedSpans = Tuple[Tuple[int, int, str, float], ...]
+
+_cache: "OrderedDict[str, CachedSpans]" = OrderedDict()
+_lock = threading.Lock()
+_stats: Dict[str, int] = {"hits": 0, "misses": 0, "evictions": 0}
+#analyzer_pool workers keep their own caches; their counters are reported
+#back with each result (see analyzer_pool) and summed here
+_worker_stats: Dict[str, int] = {"hits": 0, "misses": 0, "evictions": 0}
+#worker pid -> its cache size as of its last result
+_worker_sizes: Dict[int, int] = {}
+
+def normalize_bounds(text: str, start: int, end: int) -> Tuple[int, int]:
+    #segment bounds with surrounding whitespace trimmed (offsets stay valid)
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
+def make_key(segment: str, profile: str, language: str = "en") -> str:
+    digest = hashlib.sha256()
+    digest.update(f"{DETECTOR_VERSION}\0{profile}\0{language}\0".encode("utf-8"))
+    digest.update(segment.encode("utf-8"))
+    return digest.hexdigest()
+
+def get(key: str) -> Optional[CachedSpans]:
+    with _lock:
+        spans = _cache.get(key)
+        if spans is None:
+            _stats["misses"] += 1
+            return None
+        _cache.move_to_end(key)
+        _stats["hits"] += 1
+        return spans
+
+def put(key: str, spans: CachedSpans) -> None:
+    if PII_CACHE_SIZE <= 0:
+        return
+    with _lock:
+        _cache[key] = spans
+        _cache.move_to_end(key)
+        while len(_cache) > PII_CACHE_SIZE:
+            _cache.popitem(last=False)
+            _stats["evictions"] += 1
+
+def get_counters() -> Dict[str, int]:
+    with _lock:
+        return dict(_stats)
+
+def counters_since(before: Dict[str, int]) -> Dict[str, int]:
+    #this process's lookups since get_counters(), plus its current size
+    with _lock:
+        delta = {k: _stats[k] - before.get(k, 0) for k in _stats}
+        delta["size"] = len(_cache)
+        return delta
+
+def add_worker_counters(pid: int, delta: Dict[str, int]) -> None:
+    with _lock:
+        for k in _worker_stats:
+            _worker_stats[k] += delta.get(k, 0)
+        _worker_sizes[pid] = delta.get("size", 0)
+
+def get_stats() -> dict:
+    #totals over this process and the pool workers that reported back
+    with _lock:
+        hits = _stats["hits"] + _worker_stats["hits"]
+        misses = _stats["misses"] + _worker_stats["misses"]
+        lookups = hits + misses
+        return {
+            "size": len(_cache) + sum(_worker_sizes.values()),
+            "capacity": PII_CACHE_SIZE,
+            "hits": hits,
+            "misses": misses,
+            "evictions": _stats["evictions"] + _worker_stats["evictions"],
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "workers": len(_worker_sizes)
+        }
+
+def clear() -> None:
+    #this process only; worker caches are cleared with their processes
+    with _lock:
+        _cache.clear()
+        for k in _stats:
+            _stats[k] = 0
+        for k in _worker_stats:
+            _worker_stats[k] = 0
+        _worker_sizes.clear()
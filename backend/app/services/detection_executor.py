@@ -0,0 +1,151 @@
+import asyncio
+import functools
+import inspect
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, TypeVar
+from app.core.text_index import TextIndex
+from app.models.redaction import RedactionMap
+from app.services import analyzer_pool, sanitizer
+from app.services.redaction import generate_redaction_map
+from app.services.sanitizer import PIIEntity
+from app.services.secret_detector import SecretEntity, detect_secrets
+
+T = TypeVar("T")
+
+#threads running detection stages off the event loop
+DETECTION_THREADS = int(os.environ.get("SIFTLOCAL_DETECTION_THREADS", "2"))
+#stages allowed to run at once
+MAX_CONCURRENT = int(os.environ.get("SIFTLOCAL_DETECTION_CONCURRENCY", "2"))
+#callers allowed to wait for a slot before new work is refused
+MAX_QUEUED = int(os.environ.get("SIFTLOCAL_DETECTION_QUEUE", "32"))
+#event-loop lag sampling period (seconds)
+LAG_SAMPLE_INTERVAL = 0.1
+
+class DetectionQueueFullError(Exception):
+    def __init__(self, queued: int):
+        self.queued = queued
+        super().__init__(f"Detection queue full ({queued} waiting)")
+
+_executor: Optional[ThreadPoolExecutor] = None
+_semaphore: Optional[asyncio.Semaphore] = None
+_queued = 0
+_running = 0
+_lag_task: Optional[asyncio.Task] = None
+_lag = {"last_ms": 0.0, "max_ms": 0.0, "total_ms": 0.0, "samples": 0}
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=DETECTION_THREADS, thread_name_prefix="detection")
+    return _executor
+
+def _get_semaphore() -> asyncio.Semaphore:
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(MAX_CONCURRENT)
+    return _semaphore
+
+async def run_detection(fn: Callable[..., T], *args, **kwargs) -> T:
+    #run a blocking stage in the detection executor, bounded by the semaphore
+    #raises DetectionQueueFullError instead of queueing without limit
+    global _queued, _running
+    if _queued >= MAX_QUEUED:
+        raise DetectionQueueFullError(_queued)
+    semaphore = _get_semaphore()
+    _queued += 1
+    try:
+        await semaphore.acquire()
+    finally:
+        _queued -= 1
+    _running += 1
+    try:
+        if inspect.iscoroutinefunction(fn):
+            return await fn(*args, **kwargs)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_executor(), functools.partial(fn, *args, **kwargs))
+    finally:
+        _running -= 1
+        semaphore.release()
+
+async def detect_pii_async(
+    text: str,
+    score_threshold: float = 0.5,
+    profile: Optional[str] = None,
+    language: str = "en",
+    index: Optional[TextIndex] = None
+) -> List[PIIEntity]:
+    #with the analyzer pool running the work is already in another process
+    if analyzer_pool.is_running():
+        return await run_detection(
+            sanitizer.detect_pii_async, text, score_threshold, profile, language=language, index=index
+        )
+    return await run_detection(sanitizer.detect_pii, text, score_threshold, profile, language=language, index=index)
+
+async def detect_secrets_async(
+    text: str,
+    min_confidence: float = 0.7,
+    index: Optional[TextIndex] = None
+) -> List[SecretEntity]:
+    return await run_detection(detect_secrets, text, min_confidence, index)
+
+async def generate_redaction_map_async(
+    text: str,
+    pii_entities: List[PIIEntity],
+    secret_entities: List[SecretEntity]
+) -> RedactionMap:
+    return await run_detection(generate_redaction_map, text, pii_entities, secret_entities)
+
+async def sanitize_async(text: str, profile: Optional[str] = None) -> RedactionMap:
+    #detect PII and secrets concurrently over one shared TextIndex, then build the redaction map
+    index = await run_detection(TextIndex, text)
+    pii, secrets = await asyncio.gather(
+        detect_pii_async(text, profile=profile, index=index),
+        detect_secrets_async(text, index=index)
+    )
+    return await generate_redaction_map_async(text, pii, secrets)
+
+async def _monitor_loop_lag() -> None:
+    #a responsive loop wakes up on time; the overshoot is the lag
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(LAG_SAMPLE_INTERVAL)
+        lag_ms = max(0.0, (loop.time() - started - LAG_SAMPLE_INTERVAL) * 1000)
+        _lag["last_ms"] = lag_ms
+        _lag["max_ms"] = max(_lag["max_ms"], lag_ms)
+        _lag["total_ms"] += lag_ms
+        _lag["samples"] += 1
+
+def start_lag_monitor() -> asyncio.Task:
+    global _lag_task
+    if _lag_task is None or _lag_task.done():
+        _lag_task = asyncio.create_task(_monitor_loop_lag())
+    return _lag_task
+
+def get_stats() -> dict:
+    samples = _lag["samples"]
+    return {
+        "running": _running,
+        "queued": _queued,
+        "max_concurrent": MAX_CONCURRENT,
+        "max_queued": MAX_QUEUED,
+        "loop_lag_ms": round(_lag["last_ms"], 3),
+        "loop_lag_max_ms": round(_lag["max_ms"], 3),
+        "loop_lag_avg_ms": round(_lag["total_ms"] / samples, 3) if samples else 0.0,
+        "loop_lag_samples": samples
+    }
+
+def shutdown() -> None:
+    global _executor, _semaphore, _lag_task
+    if _lag_task is not None:
+        _lag_task.cancel()
+        _lag_task = None
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+    _semaphore = None
+
+def reset_stats() -> None:
+    for key in _lag:
+        _lag[key] = 0 if key == "samples" else 0.0
@@ -0,0 +1,118 @@
+import threading
+from collections import deque
+from typing import Dict, Iterator, List, Optional, Tuple
+from app.models.entity_lists import EntityLists
+
+#preferences key the lists are stored under in the vault
+PREFERENCE_KEY = "entity_lists"
+#forced entities outrank every detector in overlap resolution
+DENY_CONFIDENCE = 1.0
+
+#payload of a term: (is_deny, entity_type)
+TermPayload = Tuple[bool, str]
+
+class TermAutomaton:
+    #Aho-Corasick over lowercased terms: one pass over the text finds every
+    #occurrence of every term, however many terms there are
+    def __init__(self):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        #(term length, payload) of every term ending at a node
+        self._out: List[List[Tuple[int, TermPayload]]] = [[]]
+
+    def add(self, term: str, payload: TermPayload) -> None:
+        node = 0
+        for ch in _fold(term):
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        self._out[node].append((len(term), payload))
+
+    def build(self) -> None:
+        #breadth-first failure links; outputs of the fail target are inherited
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(ch, 0)
+                self._fail[child] = target if target != child else 0
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def find(self, text: str) -> Iterator[Tuple[int, int, TermPayload]]:
+        #(start, end, payload) of whole-word matches, case-insensitive
+        goto = self._goto
+        fail = self._fail
+        out = self._out
+        node = 0
+        for i, ch in enumerate(_fold(text)):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for length, payload in out[node]:
+                start = i + 1 - length
+                if _is_boundary(text, start - 1) and _is_boundary(text, i + 1):
+                    yield start, i + 1, payload
+
+def _fold(text: str) -> str:
+    #lowercase without changing length so offsets stay valid
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    return "".join(c if len(c.lower()) != 1 else c.lower() for c in text)
+
+def _is_boundary(text: str, idx: int) -> bool:
+    return idx < 0 or idx >= len(text) or not text[idx].isalnum()
+
+_lock = threading.Lock()
+_lists = EntityLists()
+_automaton: Optional[TermAutomaton] = None
+
+def compile_lists(lists: EntityLists) -> Optional[TermAutomaton]:
+    if not lists.allow and not lists.deny:
+        return None
+    automaton = TermAutomaton()
+    for term in lists.allow:
+        if term.strip():
+            automaton.add(term.strip(), (False, ""))
+    for deny in lists.deny:
+        if deny.term.strip():
+            automaton.add(deny.term.strip(), (True, deny.entity_type))
+    automaton.build()
+    return automaton
+
+def set_entity_lists(lists: EntityLists) -> None:
+    #compile once per change; detection only reads the automaton
+    global _lists, _automaton
+    automaton = compile_lists(lists)
+    with _lock:
+        _lists = lists
+        _automaton = automaton
+
+def get_entity_lists() -> EntityLists:
+    return _lists
+
+def clear_entity_lists() -> None:
+    set_entity_lists(EntityLists())
+
+def find_terms(text: str) -> Tuple[List[Tuple[int, int]], List[Tuple[int, int, str]]]:
+    #(allow spans, deny spans with entity type) found in text
+    automaton = _automaton
+    allow: List[Tuple[int, int]] = []
+    deny: List[Tuple[int, int, str]] = []
+    if automaton is None or not text:
+        return allow, deny
+    for start, end, (is_deny, entity_type) in automaton.find(text):
+        if is_deny:
+            deny.append((start, end, entity_type))
+        else:
+            allow.append((start, end))
+    return allow, deny
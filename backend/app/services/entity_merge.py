@@ -0,0 +1,53 @@
+from bisect import bisect_right
+from heapq import merge
+from typing import Iterable, List, Tuple
+
+#(start, end, confidence, entity_type, source, original_text)
+Span = Tuple[int, int, float, str, str, str]
+
+def sorted_spans(spans: List[Span]) -> List[Span]:
+    #detectors mostly emit spans in order; only sort when they did not
+    if all(spans[i][0] <= spans[i + 1][0] for i in range(len(spans) - 1)):
+        return spans
+    return sorted(spans, key=lambda s: s[0])
+
+def merge_sorted(*streams: Iterable[Span]) -> Iterable[Span]:
+    #k-way merge of start-sorted streams (stable: earlier streams win ties)
+    return merge(*streams, key=lambda s: s[0])
+
+def _resolve_cluster(cluster: List[Span]) -> List[Span]:
+    #highest confidence first; a span is kept unless it overlaps a kept span
+    #(ties: earlier start, then input order)
+    order = sorted(range(len(cluster)), key=lambda i: (-cluster[i][2], cluster[i][0], i))
+    starts: List[int] = []
+    ends: List[int] = []
+    kept: List[Span] = []
+    for i in order:
+        span = cluster[i]
+        start, end = span[0], span[1]
+        pos = bisect_right(starts, start)
+        if pos > 0 and ends[pos - 1] > start:
+            continue
+        if pos < len(starts) and starts[pos] < end:
+            continue
+        starts.insert(pos, start)
+        ends.insert(pos, end)
+        kept.insert(pos, span)
+    return kept
+
+def merge_spans(spans: Iterable[Span]) -> List[Span]:
+    #sweep start-sorted spans into clusters of transitively overlapping spans;
+    #each cluster is resolved on its own, so a weak span can never survive
+    #just because it only overlaps the span that was kept before it
+    result: List[Span] = []
+    cluster: List[Span] = []
+    cluster_end = -1
+    for span in spans:
+        if cluster and span[0] >= cluster_end:
+            result.extend(cluster if len(cluster) == 1 else _resolve_cluster(cluster))
+            cluster = []
+        cluster.append(span)
+        cluster_end = span[1] if len(cluster) == 1 else max(cluster_end, span[1])
+    if cluster:
+        result.extend(cluster if len(cluster) == 1 else _resolve_cluster(cluster))
+    return result
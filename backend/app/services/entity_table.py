@@ -0,0 +1,378 @@
+import os
+import struct
+import threading
+import weakref
+from array import array
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from app.core.memory import str_bytes
+from app.models.redaction import DetectedEntity, RedactionMap
+from app.services.offset_map import OffsetMap, redact_spans
+
+SOURCES = ("pii", "secret")
+_SOURCE_IDS = {name: i for i, name in enumerate(SOURCES)}
+#float32 keeps ~7 significant digits; values are rounded back on the way out
+CONFIDENCE_DIGITS = 6
+#derived redacted texts kept around (most recently read documents)
+REDACTED_CACHE_SIZE = int(os.environ.get("SIFTLOCAL_REDACTED_CACHE_SIZE", "8"))
+
+#(start, end, confidence, entity_type, source, original_text, placeholder)
+EntityRow = Tuple[int, int, float, str, str, str, str]
+
+class EntityTable:
+    #columnar entity storage: offsets in int arrays, interned type ids,
+    #float32 confidences and one packed buffer each for distinct values and
+    #distinct placeholders (entities point into them by id), so repeated
+    #values/interned placeholders are stored once
+    #(a few dozen bytes per entity instead of a pydantic object per entity)
+    #when every value is source_text[start:end] no value buffer is kept at all
+    __slots__ = (
+        "starts", "ends", "type_ids", "source_ids", "confidences", "types", "_type_index",
+        "values", "value_offsets", "value_ids", "placeholders", "placeholder_offsets", "placeholder_ids",
+        "source_text"
+    )
+
+    def __init__(self):
+        self.starts = array('q')
+        self.ends = array('q')
+        self.type_ids = array('H')
+        self.source_ids = array('B')
+        self.confidences = array('f')
+        self.types: List[str] = []
+        self._type_index: Dict[str, int] = {}
+        self.values = ""
+        self.value_offsets = array('q', [0])
+        self.value_ids = array('I')
+        self.placeholders = ""
+        self.placeholder_offsets = array('q', [0])
+        self.placeholder_ids = array('I')
+        self.source_text: Optional[str] = None
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[EntityRow], source_text: Optional[str] = None) -> "EntityTable":
+        table = cls()
+        values = _StringPool()
+        placeholders = _StringPool()
+        sliced = source_text is not None
+        for start, end, confidence, entity_type, source, original_text, placeholder in rows:
+            type_id = table._type_index.get(entity_type)
+            if type_id is None:
+                type_id = len(table.types)
+                table._type_index[entity_type] = type_id
+                table.types.append(entity_type)
+            table.starts.append(start)
+            table.ends.append(end)
+            table.type_ids.append(type_id)
+            table.source_ids.append(_SOURCE_IDS[source])
+            table.confidences.append(confidence)
+            table.value_ids.append(values.add(original_text))
+            table.placeholder_ids.append(placeholders.add(placeholder))
+            if sliced and original_text != source_text[start:end]:
+                sliced = False
+        table.placeholders, table.placeholder_offsets = placeholders.pack()
+        if sliced:
+            #values are slices of the document: reference it instead of copying
+            table.source_text = source_text
+            table.value_ids = array('I')
+        else:
+            table.values, table.value_offsets = values.pack()
+        return table
+
+    @classmethod
+    def from_entities(cls, entities: Iterable[DetectedEntity], source_text: Optional[str] = None) -> "EntityTable":
+        return cls.from_rows(
+            ((e.start, e.end, e.confidence, e.entity_type, e.source, e.original_text, e.placeholder) for e in entities),
+            source_text
+        )
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def entity_type(self, i: int) -> str:
+        return self.types[self.type_ids[i]]
+
+    def source(self, i: int) -> str:
+        return SOURCES[self.source_ids[i]]
+
+    def confidence(self, i: int) -> float:
+        return round(self.confidences[i], CONFIDENCE_DIGITS)
+
+    def original_text(self, i: int) -> str:
+        if self.source_text is not None:
+            return self.source_text[self.starts[i]:self.ends[i]]
+        v = self.value_ids[i]
+        return self.values[self.value_offsets[v]:self.value_offsets[v + 1]]
+
+    def placeholder(self, i: int) -> str:
+        p = self.placeholder_ids[i]
+        return self.placeholders[self.placeholder_offsets[p]:self.placeholder_offsets[p + 1]]
+
+    def distinct_placeholders(self) -> List[str]:
+        #each placeholder once, in order of first use
+        offsets = self.placeholder_offsets
+        return [self.placeholders[offsets[p]:offsets[p + 1]] for p in range(len(offsets) - 1)]
+
+    def first_index_by_placeholder(self) -> List[int]:
+        #rows in order, skipping repeats of a placeholder already listed
+        #(entities without a placeholder are never collapsed)
+        seen = set()
+        rows = []
+        offsets = self.placeholder_offsets
+        for i, p in enumerate(self.placeholder_ids):
+            if p in seen:
+                continue
+            if offsets[p + 1] > offsets[p]:
+                seen.add(p)
+            rows.append(i)
+        return rows
+
+    def entity(self, i: int) -> DetectedEntity:
+        return DetectedEntity(
+            entity_type=self.entity_type(i),
+            source=self.source(i),
+            start=self.starts[i],
+            end=self.ends[i],
+            confidence=self.confidence(i),
+            original_text=self.original_text(i),
+            placeholder=self.placeholder(i)
+        )
+
+    def to_entities(self) -> List[DetectedEntity]:
+        #API boundary: materialize pydantic models
+        return [self.entity(i) for i in range(len(self))]
+
+    def __iter__(self) -> Iterator[DetectedEntity]:
+        for i in range(len(self)):
+            yield self.entity(i)
+
+    def iter_spans(self) -> Iterator[Tuple[int, int, str]]:
+        #(start, end, placeholder) in start order
+        for i in range(len(self)):
+            yield self.starts[i], self.ends[i], self.placeholder(i)
+
+    def nbytes(self) -> int:
+        #payload bytes (arrays plus packed text), ignoring object headers
+        #(a referenced source_text belongs to the document, not the table)
+        arrays = (
+            self.starts, self.ends, self.type_ids, self.source_ids, self.confidences,
+            self.value_offsets, self.value_ids, self.placeholder_offsets, self.placeholder_ids
+        )
+        return (
+            sum(a.itemsize * len(a) for a in arrays)
+            + str_bytes(self.values) + str_bytes(self.placeholders)
+            + sum(str_bytes(t) for t in self.types)
+        )
+
+    _COLUMNS = (
+        "starts", "ends", "type_ids", "source_ids", "confidences",
+        "value_offsets", "value_ids", "placeholder_offsets", "placeholder_ids"
+    )
+
+    def to_blobs(self) -> List[bytes]:
+        #raw column buffers (native byte order: read back by this process only)
+        return [getattr(self, name).tobytes() for name in self._COLUMNS] + [
+            "\x00".join(self.types).encode(),
+            self.values.encode(),
+            self.placeholders.encode()
+        ]
+
+    @classmethod
+    def from_blobs(cls, blobs: List[bytes], source_text: Optional[str] = None) -> "EntityTable":
+        table = cls()
+        for name, blob in zip(cls._COLUMNS, blobs):
+            column = array(getattr(table, name).typecode)
+            column.frombytes(blob)
+            setattr(table, name, column)
+        types = blobs[len(cls._COLUMNS)].decode()
+        table.types = types.split("\x00") if types else []
+        table._type_index = {t: i for i, t in enumerate(table.types)}
+        table.values = blobs[len(cls._COLUMNS) + 1].decode()
+        table.placeholders = blobs[len(cls._COLUMNS) + 2].decode()
+        table.source_text = source_text
+        return table
+
+class _StringPool:
+    #distinct strings in first-seen order, packed into one buffer on pack()
+    __slots__ = ("_ids", "_strings")
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self._strings: List[str] = []
+
+    def add(self, value: str) -> int:
+        string_id = self._ids.get(value)
+        if string_id is None:
+            string_id = len(self._strings)
+            self._ids[value] = string_id
+            self._strings.append(value)
+        return string_id
+
+    def pack(self) -> Tuple[str, array]:
+        offsets = array('q', [0])
+        end = 0
+        for value in self._strings:
+            end += len(value)
+            offsets.append(end)
+        return "".join(self._strings), offsets
+
+def _pack_blobs(blobs: List[bytes]) -> bytes:
+    #length-prefixed concatenation
+    parts = [struct.pack("<I", len(blobs))]
+    parts.extend(struct.pack("<Q", len(blob)) for blob in blobs)
+    parts.extend(blobs)
+    return b"".join(parts)
+
+def _unpack_blobs(data: bytes) -> List[bytes]:
+    (count,) = struct.unpack_from("<I", data)
+    lengths = struct.unpack_from(f"<{count}Q", data, 4)
+    pos = 4 + 8 * count
+    blobs = []
+    for length in lengths:
+        blobs.append(data[pos:pos + length])
+        pos += length
+    return blobs
+
+#record id -> (weak ref to record, redacted text), least recently used first
+_redacted_cache: "OrderedDict[int, Tuple[weakref.ref, str]]" = OrderedDict()
+#reentrant: the weakref callback can run from GC while this thread holds it
+_cache_lock = threading.RLock()
+
+def _cache_redacted(record: "SanitizedRecord", redacted: str) -> None:
+    key = id(record)
+    with _cache_lock:
+        #the entry goes away with the record, or when it falls out of the LRU
+        _redacted_cache[key] = (weakref.ref(record, lambda ref: _drop_redacted(key, ref)), redacted)
+        _redacted_cache.move_to_end(key)
+        while len(_redacted_cache) > REDACTED_CACHE_SIZE:
+            _redacted_cache.popitem(last=False)
+
+def _cached_redacted(record: "SanitizedRecord") -> Optional[str]:
+    key = id(record)
+    with _cache_lock:
+        entry = _redacted_cache.get(key)
+        if entry is None or entry[0]() is not record:
+            return None
+        _redacted_cache.move_to_end(key)
+        return entry[1]
+
+def _drop_redacted(key: int, ref: weakref.ref) -> None:
+    with _cache_lock:
+        #only the entry this ref belongs to (ids are reused)
+        entry = _redacted_cache.get(key)
+        if entry is not None and entry[0] is ref:
+            del _redacted_cache[key]
+
+def redacted_cache_bytes() -> int:
+    with _cache_lock:
+        #snapshot: a callback may drop entries mid-sum
+        return sum(str_bytes(text) for _, text in list(_redacted_cache.values()))
+
+def clear_redacted_cache() -> None:
+    with _cache_lock:
+        _redacted_cache.clear()
+
+class SanitizedRecord:
+    #what memory_manager keeps per sanitized document: the original text once,
+    #entity columns (values sliced from it) and the offset map;
+    #redacted_text is derived from those on demand and kept in a small LRU
+    #(stored explicitly only when it cannot be derived)
+    __slots__ = ("original_text", "_redacted_text", "entities", "created_at", "offsets", "__weakref__")
+
+    def __init__(
+        self,
+        original_text: str,
+        redacted_text: Optional[str],
+        entities: EntityTable,
+        created_at: datetime,
+        offsets: OffsetMap,
+        derived_redacted: Optional[str] = None
+    ):
+        #redacted_text=None derives it from original_text and entities;
+        #derived_redacted seeds the cache when the caller already built it
+        self.original_text = original_text
+        self._redacted_text = redacted_text
+        self.entities = entities
+        self.created_at = created_at
+        self.offsets = offsets
+        if redacted_text is None and derived_redacted is not None:
+            _cache_redacted(self, derived_redacted)
+
+    @property
+    def redacted_text(self) -> str:
+        if self._redacted_text is not None:
+            return self._redacted_text
+        redacted = _cached_redacted(self)
+        if redacted is None:
+            redacted, _ = redact_spans(self.original_text, sorted(self.entities.iter_spans()))
+            _cache_redacted(self, redacted)
+        return redacted
+
+    @property
+    def stores_redacted_text(self) -> bool:
+        return self._redacted_text is not None
+
+    @classmethod
+    def from_redaction_map(cls, redaction_map: RedactionMap) -> "SanitizedRecord":
+        #keeps redacted_text only if it differs from what the entities produce
+        original = redaction_map.original_text
+        entities = EntityTable.from_entities(redaction_map.entities, source_text=original)
+        derived, offsets = redact_spans(original, sorted(entities.iter_spans()))
+        if derived == redaction_map.redacted_text:
+            return cls(original, None, entities, redaction_map.created_at, OffsetMap(offsets), derived)
+        return cls(
+            original,
+            redaction_map.redacted_text,
+            entities,
+            redaction_map.created_at,
+            OffsetMap.from_entities(redaction_map.entities)
+        )
+
+    def nbytes(self) -> int:
+        #document text, entity columns, offset map and a stored redacted text
+        #(a derived redacted text lives in the bounded LRU and is not counted)
+        total = str_bytes(self.original_text) + self.entities.nbytes() + self.offsets.nbytes()
+        if self._redacted_text is not None:
+            total += str_bytes(self._redacted_text)
+        return total
+
+    def to_bytes(self) -> bytes:
+        #compact binary form for the spill tier: text once, raw columns
+        flags = (1 if self._redacted_text is not None else 0) | (2 if self.entities.source_text is not None else 0)
+        offsets = self.offsets
+        return _pack_blobs([
+            bytes([flags]),
+            self.original_text.encode(),
+            (self._redacted_text or "").encode(),
+            self.created_at.isoformat().encode(),
+            offsets.original_starts.tobytes(),
+            offsets.original_ends.tobytes(),
+            offsets.redacted_starts.tobytes(),
+            offsets.redacted_ends.tobytes(),
+            *self.entities.to_blobs()
+        ])
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "SanitizedRecord":
+        blobs = _unpack_blobs(data)
+        flags = blobs[0][0]
+        original = blobs[1].decode()
+        offsets = OffsetMap()
+        for name, blob in zip(OffsetMap.__slots__, blobs[4:8]):
+            getattr(offsets, name).frombytes(blob)
+        entities = EntityTable.from_blobs(blobs[8:], source_text=original if flags & 2 else None)
+        return cls(
+            original,
+            blobs[2].decode() if flags & 1 else None,
+            entities,
+            datetime.fromisoformat(blobs[3].decode()),
+            offsets
+        )
+
+    def to_redaction_map(self) -> RedactionMap:
+        return RedactionMap(
+            original_text=self.original_text,
+            redacted_text=self.redacted_text,
+            entities=self.entities.to_entities(),
+            created_at=self.created_at
+        )
@@ -1,13 +1,49 @@
 import hashlib
+import os
 import uuid
 from pathlib import Path
 from typing import Optional
 from app.models.documents import ALLOWED_EXTENSIONS, DocumentInfo
 
+#uploads are read and hashed in chunks of this size
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+#larger uploads are rejected with 413
+MAX_UPLOAD_BYTES = int(os.environ.get("SIFTLOCAL_MAX_UPLOAD_MB", "512")) * 1024 * 1024
+#leading bytes of known binary formats -> format name
+MAGIC_SIGNATURES = {
+    b"%PDF-": "pdf",
+    b"PK\x03\x04": "zip",
+    #DOS header as written by every PE linker (bare "MZ" starts plain text too)
+    b"MZ\x90\x00": "exe",
+    b"\x7fELF": "elf",
+    b"\x89PNG\r\n\x1a\n": "png",
+    b"\xff\xd8\xff": "jpeg",
+    b"GIF8": "gif",
+    b"\x1f\x8b": "gzip",
+    b"\xd0\xcf\x11\xe0": "ole",
+}
+#formats each extension may contain (pptx is a zip container)
+EXPECTED_FORMATS = {".pdf": {"pdf"}, ".pptx": {"zip"}, ".csv": set(), ".txt": set()}
+#enough leading bytes to sniff every signature
+SNIFF_BYTES = max(len(signature) for signature in MAGIC_SIGNATURES)
+
 #in-memory document store (I4: no persistence)
 _documents: dict[str, dict] = {}
 #in-memory file content store (cleared after parsing)
 _file_contents: dict[str, bytes] = {}
+#content-addressed dedup: identical re-uploads get their own document id but
+#share the first upload's bytes, parse and redaction results (keyed by the
+#owner's id) until they write results of their own
+#(sha256, file type) -> owning doc id; the type is part of the key because
+#the same bytes parse differently as .csv and .txt
+_content_index: dict[tuple[str, str], str] = {}
+#owning doc id -> its index key (so releasing it is O(1))
+_owner_keys: dict[str, tuple[str, str]] = {}
+#doc id -> owning doc id, for re-uploads only
+_aliases: dict[str, str] = {}
+#owning doc id -> doc ids (itself included) still referencing its content
+_content_refs: dict[str, set[str]] = {}
+_dedup_stats = {"deduplicated_uploads": 0, "bytes_saved": 0}
 
 def validate_file_type(filename: str) -> tuple[bool, str]:
     ext = Path(filename).suffix.lower()
@@ -15,12 +51,39 @@ def validate_file_type(filename: str) -> tuple[bool, str]:
         return False, f"File type {ext} not allowed. Allowed: {', '.join(ALLOWED_EXTENSIONS)}"
     return True, ext
 
+def sniff_format(head: bytes) -> Optional[str]:
+    for signature, name in MAGIC_SIGNATURES.items():
+        if head.startswith(signature):
+            return name
+    return None
+
+def validate_magic(file_type: str, head: bytes) -> tuple[bool, str]:
+    #only a recognised binary format that contradicts the extension is
+    #rejected; unrecognised content is left to the parser
+    detected = sniff_format(head)
+    if detected is None or detected in EXPECTED_FORMATS.get(file_type, set()):
+        return True, file_type
+    return False, f"File content ({detected}) does not match {file_type}"
+
 def compute_sha256(content: bytes) -> str:
     return hashlib.sha256(content).hexdigest()
 
-def store_document(filename: str, content: bytes, file_type: str) -> DocumentInfo:
+def _reusable_owner(sha256: str, file_type: str) -> Optional[str]:
+    owner = _content_index.get((sha256, file_type))
+    if owner is None:
+        return None
+    #late import to avoid circular dependency
+    from app.services.memory_manager import DocumentState, get_document_state
+    if get_document_state(owner) in (DocumentState.EVICTED, DocumentState.ERROR):
+        #its results are gone or unusable: the new upload takes over
+        return None
+    return owner
+
+def store_document(filename: str, content: bytes, file_type: str, sha256: Optional[str] = None) -> DocumentInfo:
+    #sha256 may be passed in when the caller hashed the content while reading it
     doc_id = str(uuid.uuid4())
-    sha256 = compute_sha256(content)
+    if sha256 is None:
+        sha256 = compute_sha256(content)
     doc = {
         "document_id": doc_id,
         "filename": filename,
@@ -29,10 +92,75 @@ def store_document(filename: str, content: bytes, file_type: str) -> DocumentInf
         "size": len(content),
         "status": "uploaded"
     }
+    owner = _reusable_owner(sha256, file_type)
+    if owner is not None:
+        #byte-identical re-upload: reference the owner's content and results
+        _aliases[doc_id] = owner
+        _content_refs[owner].add(doc_id)
+        if owner in _documents:
+            doc["status"] = _documents[owner]["status"]
+        _documents[doc_id] = doc
+        _dedup_stats["deduplicated_uploads"] += 1
+        _dedup_stats["bytes_saved"] += len(content)
+        return DocumentInfo(**doc)
     _documents[doc_id] = doc
     _file_contents[doc_id] = content
+    _content_index[(sha256, file_type)] = doc_id
+    _owner_keys[doc_id] = (sha256, file_type)
+    _content_refs[doc_id] = {doc_id}
+    #late import to avoid circular dependency (memory_manager owns the budget)
+    from app.services import memory_manager
+    memory_manager.account_document(doc_id)
     return DocumentInfo(**doc)
 
+def resolve_document(doc_id: str) -> str:
+    #id under which a document's content and results are stored
+    return _aliases.get(doc_id, doc_id)
+
+def detach_document(doc_id: str) -> Optional[str]:
+    #copy-on-write: an alias about to write its own results stops sharing;
+    #returns the owner it shared with (None if it was not an alias) so the
+    #caller can carry over references to the owner's content
+    owner = _aliases.pop(doc_id, None)
+    if owner is not None:
+        _content_refs[owner].discard(doc_id)
+    return owner
+
+def release_document(doc_id: str) -> Optional[str]:
+    #drops doc_id's reference; returns the owner id whose content is now
+    #unreferenced and should be freed (None while other documents share it)
+    owner = resolve_document(doc_id)
+    _aliases.pop(doc_id, None)
+    refs = _content_refs.get(owner)
+    if refs is None:
+        #never registered (content stored directly)
+        return owner
+    refs.discard(doc_id)
+    if refs:
+        return None
+    del _content_refs[owner]
+    key = _owner_keys.pop(owner, None)
+    #a newer upload may have taken over the key (owner was evicted)
+    if key is not None and _content_index.get(key) == owner:
+        del _content_index[key]
+    return owner
+
+def list_aliases() -> list[tuple[str, str]]:
+    #(alias, owner) for every re-upload still sharing content
+    return list(_aliases.items())
+
+def is_released(owner: str) -> bool:
+    #owner's own document was cleaned up; its content lives on for aliases
+    refs = _content_refs.get(owner)
+    return refs is not None and owner not in refs
+
+def get_dedup_stats() -> dict:
+    return {
+        "content_owners": len(_content_refs),
+        "aliases": len(_aliases),
+        **_dedup_stats
+    }
+
 def get_document(doc_id: str) -> Optional[DocumentInfo]:
     doc = _documents.get(doc_id)
     if doc:
@@ -40,19 +168,37 @@ def get_document(doc_id: str) -> Optional[DocumentInfo]:
     return None
 
 def get_file_content(doc_id: str) -> Optional[bytes]:
+    doc_id = resolve_document(doc_id)
+    from app.services import memory_manager
+    memory_manager.touch_document(doc_id)
     return _file_contents.get(doc_id)
 
 def clear_file_content(doc_id: str):
     if doc_id in _file_contents:
         del _file_contents[doc_id]
+        from app.services import memory_manager
+        memory_manager.account_document(doc_id)
 
 def update_document_status(doc_id: str, status: str):
-    if doc_id in _documents:
-        _documents[doc_id]["status"] = status
+    #applies to every document sharing the same content
+    owner = resolve_document(doc_id)
+    for sharer in _content_refs.get(owner, {doc_id}):
+        if sharer in _documents:
+            _documents[sharer]["status"] = status
 
 def list_documents() -> list[DocumentInfo]:
     return [DocumentInfo(**doc) for doc in _documents.values()]
 
 def clear_all():
+    doc_ids = list(_file_contents)
     _documents.clear()
     _file_contents.clear()
+    _content_index.clear()
+    _owner_keys.clear()
+    _aliases.clear()
+    _content_refs.clear()
+    for key in _dedup_stats:
+        _dedup_stats[key] = 0
+    from app.services import memory_manager
+    for doc_id in doc_ids:
+        memory_manager.account_document(doc_id)
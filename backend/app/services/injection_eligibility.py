@@ -1,5 +1,5 @@
 from typing import List, Optional, Dict, Any
-from app.services.memory_manager import get_sanitized_content, list_sanitized_documents
+from app.services.memory_manager import get_sanitized_content, get_sanitized_record, list_sanitized_documents
 from app.services.review_manager import get_chunk_status, list_approved_chunks
 
 class InjectionNotEligibleError(Exception):
@@ -14,14 +14,14 @@ def is_eligible(chunk_id: str) -> bool:
     if status != "approved":
         return False
     #chunk must exist in sanitized content
-    if get_sanitized_content(chunk_id) is None:
+    if get_sanitized_record(chunk_id) is None:
         return False
     return True
 
 def require_eligible(chunk_id: str) -> None:
     #raises InjectionNotEligibleError if chunk is not eligible
     #check existence first
-    if get_sanitized_content(chunk_id) is None:
+    if get_sanitized_record(chunk_id) is None:
         raise InjectionNotEligibleError(chunk_id, "chunk does not exist")
     status = get_chunk_status(chunk_id)
     if status == "pending":
@@ -44,7 +44,7 @@ def get_eligible_contents() -> Dict[str, Any]:
     return {
         chunk_id: get_sanitized_content(chunk_id)
         for chunk_id in eligible_ids
-        if get_sanitized_content(chunk_id) is not None
+        if get_sanitized_record(chunk_id) is not None
     }
 
 def get_eligibility_summary() -> Dict[str, Any]:
@@ -0,0 +1,164 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import spacy
+from presidio_analyzer import AnalyzerEngine, RecognizerRegistry
+from presidio_analyzer.nlp_engine import SpacyNlpEngine
+from presidio_analyzer.predefined_recognizers import (
+    CreditCardRecognizer, CryptoRecognizer, EmailRecognizer, IbanRecognizer,
+    IpRecognizer, PhoneRecognizer, UrlRecognizer
+)
+
+DEFAULT_LANGUAGE = "en"
+
+#spaCy model per language; override with SIFTLOCAL_LANGUAGE_MODELS="de=de_core_news_md,fr=..."
+LANGUAGE_MODELS: Dict[str, str] = {
+    "en": "en_core_web_lg",
+    "de": "de_core_news_lg",
+    "es": "es_core_news_lg",
+    "fr": "fr_core_news_lg",
+    "it": "it_core_news_lg",
+    "nl": "nl_core_news_lg",
+    "pt": "pt_core_news_lg",
+}
+for _pair in filter(None, os.environ.get("SIFTLOCAL_LANGUAGE_MODELS", "").split(",")):
+    _lang, _, _model = _pair.partition("=")
+    LANGUAGE_MODELS[_lang.strip()] = _model.strip()
+
+#loaded models must fit in this budget; least recently used are evicted
+MODEL_MEMORY_BUDGET_MB = int(os.environ.get("SIFTLOCAL_MODEL_MEMORY_MB", "2048"))
+#resident size estimate per spaCy model size suffix
+MODEL_SIZE_MB = {"lg": 800, "md": 150, "sm": 50}
+DEFAULT_MODEL_SIZE_MB = 800
+
+#frequent function words per language (detection by stopword hits)
+STOPWORDS: Dict[str, frozenset] = {
+    "en": frozenset("the and of to in is that for it with as was on are be this by not or have from at".split()),
+    "de": frozenset("der die und das ist nicht ein eine zu den mit von sich des auf für im dem ich auch".split()),
+    "es": frozenset("el la de que y en los se del las por un una para con no es al lo como".split()),
+    "fr": frozenset("le la les de des et est que un une du en pour dans qui pas sur au avec il".split()),
+    "it": frozenset("il di che la e per un una non sono del della le con gli ma anche si nel".split()),
+    "nl": frozenset("de het een en van is dat niet op te zijn met voor die er ook aan bij".split()),
+    "pt": frozenset("o a de que e do da em um uma para com não os no se na por mais".split()),
+}
+#minimum stopword hits before a guess is trusted
+MIN_STOPWORD_HITS = 3
+#only the head of a long text is sampled
+DETECTION_SAMPLE_CHARS = 5_000
+
+_WORD = re.compile(r"[^\W\d_]+")
+#language-agnostic pattern recognizers registered for every language
+_AGNOSTIC_RECOGNIZERS = (
+    CreditCardRecognizer, CryptoRecognizer, EmailRecognizer, IbanRecognizer,
+    IpRecognizer, PhoneRecognizer, UrlRecognizer
+)
+
+#(language, model, excluded components) -> (analyzer, estimated MB), LRU order
+_loaded: "OrderedDict[Tuple[str, str, Tuple[str, ...]], Tuple[AnalyzerEngine, int]]" = OrderedDict()
+_lock = threading.Lock()
+_evictions = 0
+#model name -> installed (package or model directory), checked once
+_installed: Dict[str, bool] = {}
+
+def detect_language(text: str) -> str:
+    #cheap stopword vote; falls back to DEFAULT_LANGUAGE when unsure
+    counts: Dict[str, int] = {}
+    for match in _WORD.finditer(text, 0, DETECTION_SAMPLE_CHARS):
+        word = match.group().lower()
+        for lang, words in STOPWORDS.items():
+            if lang in LANGUAGE_MODELS and word in words:
+                counts[lang] = counts.get(lang, 0) + 1
+    if not counts:
+        return DEFAULT_LANGUAGE
+    best = max(counts, key=lambda lang: (counts[lang], lang == DEFAULT_LANGUAGE))
+    return best if counts[best] >= MIN_STOPWORD_HITS else DEFAULT_LANGUAGE
+
+def is_installed(language: str) -> bool:
+    model_name = LANGUAGE_MODELS.get(language)
+    if not model_name:
+        return False
+    installed = _installed.get(model_name)
+    if installed is None:
+        installed = spacy.util.is_package(model_name) or Path(model_name).is_dir()
+        _installed[model_name] = installed
+    return installed
+
+def route_language(text: str) -> str:
+    #language for language="auto": the detected one if its model is
+    #installed, else DEFAULT_LANGUAGE (rather than failing in spacy.load)
+    language = detect_language(text)
+    if language != DEFAULT_LANGUAGE and not is_installed(language):
+        return DEFAULT_LANGUAGE
+    return language
+
+def estimate_model_mb(model_name: str) -> int:
+    return MODEL_SIZE_MB.get(model_name.rsplit("_", 1)[-1], DEFAULT_MODEL_SIZE_MB)
+
+def _build_analyzer(language: str, model_name: str, excluded: Tuple[str, ...]) -> AnalyzerEngine:
+    nlp_engine = SpacyNlpEngine(models=[{"lang_code": language, "model_name": model_name}])
+    #load the model ourselves so excluded components never hit memory
+    nlp_engine.nlp = {language: spacy.load(model_name, exclude=list(excluded))}
+    if language == DEFAULT_LANGUAGE:
+        return AnalyzerEngine(nlp_engine=nlp_engine)
+    registry = RecognizerRegistry(supported_languages=[language])
+    registry.load_predefined_recognizers(languages=[language], nlp_engine=nlp_engine)
+    #older presidio only registers these for English
+    present = {type(r) for r in registry.recognizers}
+    for recognizer_cls in _AGNOSTIC_RECOGNIZERS:
+        if recognizer_cls not in present:
+            registry.add_recognizer(recognizer_cls(supported_language=language))
+    return AnalyzerEngine(nlp_engine=nlp_engine, registry=registry, supported_languages=[language])
+
+def _evict_over_budget(keep: Tuple[str, str, Tuple[str, ...]]) -> None:
+    global _evictions
+    used = sum(size for _, size in _loaded.values())
+    for key in list(_loaded):
+        if used <= MODEL_MEMORY_BUDGET_MB:
+            return
+        if key == keep:
+            continue
+        _, size = _loaded.pop(key)
+        used -= size
+        _evictions += 1
+
+def get_analyzer(language: str, model_name: Optional[str] = None, excluded: Tuple[str, ...] = ()) -> AnalyzerEngine:
+    #lazy-load the analyzer for a language, evicting idle models over budget
+    model_name = model_name or LANGUAGE_MODELS.get(language)
+    if not model_name:
+        raise ValueError(f"No spaCy model configured for language {language}")
+    key = (language, model_name, tuple(excluded))
+    with _lock:
+        entry = _loaded.get(key)
+        if entry is not None:
+            _loaded.move_to_end(key)
+            return entry[0]
+        analyzer = _build_analyzer(language, model_name, key[2])
+        _loaded[key] = (analyzer, estimate_model_mb(model_name))
+        _evict_over_budget(keep=key)
+        return analyzer
+
+def list_loaded() -> List[dict]:
+    with _lock:
+        return [
+            {"language": lang, "model": model, "excluded": list(excluded), "estimated_mb": size}
+            for (lang, model, excluded), (_, size) in _loaded.items()
+        ]
+
+def get_stats() -> dict:
+    with _lock:
+        return {
+            "loaded": len(_loaded),
+            "estimated_mb": sum(size for _, size in _loaded.values()),
+            "budget_mb": MODEL_MEMORY_BUDGET_MB,
+            "evictions": _evictions
+        }
+
+def clear() -> None:
+    global _evictions
+    with _lock:
+        _loaded.clear()
+        _evictions = 0
+        _installed.clear()
@@ -1,6 +1,15 @@
+import json
+import os
+import threading
+from collections import OrderedDict
 from enum import Enum
-from typing import Optional, List
-from app.services import file_handler
+from typing import Optional, List, Union
+from app.models.redaction import RedactionMap
+from app.core import llm_gate
+from app.core.memory import process_memory, str_bytes
+from app.services import entity_table, file_handler, spill_store
+from app.services.entity_table import SanitizedRecord
+from app.services.offset_map import OffsetMap
 
 class DocumentState(Enum):
     UPLOADED = "uploaded"
@@ -10,44 +19,303 @@ class DocumentState(Enum):
     SANITIZED = "sanitized"
     COMPLETED = "completed"
     ERROR = "error"
+    #dropped under memory pressure; the client has to upload it again
+    EVICTED = "evicted"
+
+#ceiling for document bytes held in memory (file bytes, raw extracts and
+#sanitized records together); least recently used finished documents go first
+MEMORY_BUDGET_BYTES = int(os.environ.get("SIFTLOCAL_MEMORY_BUDGET_MB", "512")) * 1024 * 1024
+#documents still being processed are never evicted (finished ones are
+#spilled encrypted to disk while unlocked, see spill_store)
+EVICTABLE_STATES = frozenset({DocumentState.SANITIZED, DocumentState.COMPLETED})
 
 #state tracking per document
 _document_states: dict[str, DocumentState] = {}
 #raw parsed text/metadata - separate from file bytes
 _raw_extracts: dict[str, dict] = {}
-#sanitized content for human review
-_sanitized_content: dict[str, "RedactionMap"] = {}
+#sanitized content for human review (columnar entities, see entity_table)
+_sanitized_content: dict[str, SanitizedRecord] = {}
+#doc id -> bytes held across the stores, least recently used first
+_document_bytes: "OrderedDict[str, int]" = OrderedDict()
+_total_bytes = 0
+#highest _total_bytes seen since start/clear_all
+_peak_bytes = 0
+_evicted_count = 0
+_spilled_count = 0
+#spill_store entry kinds
+SPILL_EXTRACT = "extract"
+SPILL_RECORD = "record"
+#reentrant: eviction runs inside store/clear calls
+_budget_lock = threading.RLock()
+#doc id -> (extract, record) taken out of the stores for a spill that is
+#still being written; reading or writing the document takes them back
+_spilling: dict[str, tuple] = {}
+#one spill write at a time, so a stale write cannot replace a newer one
+_spill_io_lock = threading.Lock()
+
+def _value_bytes(value) -> int:
+    #payload bytes of extract values (text, nested metadata), not object headers
+    if isinstance(value, str):
+        return str_bytes(value)
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(_value_bytes(k) + _value_bytes(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sum(_value_bytes(v) for v in value)
+    return 8
+
+def document_usage(doc_id: str) -> dict:
+    #bytes held in memory for one document, per store
+    content = file_handler._file_contents.get(doc_id)
+    extract = _raw_extracts.get(doc_id)
+    record = _sanitized_content.get(doc_id)
+    return {
+        "file_bytes": len(content) if content is not None else 0,
+        "extract_bytes": _value_bytes(extract) if extract is not None else 0,
+        "sanitized_bytes": record.nbytes() if record is not None else 0
+    }
+
+def document_bytes(doc_id: str) -> int:
+    return sum(document_usage(doc_id).values())
+
+def account_document(doc_id: str) -> None:
+    #re-measure a document after one of its stores changed, then enforce the
+    #budget (the document itself is the most recent and is kept)
+    global _total_bytes, _peak_bytes
+    with _budget_lock:
+        _total_bytes -= _document_bytes.pop(doc_id, 0)
+        size = document_bytes(doc_id)
+        if size:
+            _document_bytes[doc_id] = size
+            _total_bytes += size
+            _peak_bytes = max(_peak_bytes, _total_bytes)
+    _enforce_budget(keep=doc_id)
+
+def touch_document(doc_id: str) -> None:
+    with _budget_lock:
+        if doc_id in _document_bytes:
+            _document_bytes.move_to_end(doc_id)
+
+def _forget_document(doc_id: str) -> None:
+    global _total_bytes
+    with _budget_lock:
+        _total_bytes -= _document_bytes.pop(doc_id, 0)
+
+def _enforce_budget(keep: Optional[str] = None) -> None:
+    #evict in LRU order until under budget; stays over it when everything
+    #left is still in flight. Victims are picked under the lock, their spills
+    #are written after it is released (must not be called with it held)
+    pending = []
+    with _budget_lock:
+        if _total_bytes <= MEMORY_BUDGET_BYTES:
+            return
+        for doc_id in list(_document_bytes):
+            if _total_bytes <= MEMORY_BUDGET_BYTES:
+                break
+            if doc_id != keep and _document_states.get(doc_id) in EVICTABLE_STATES:
+                pending.extend(_take_out(doc_id))
+    _write_spills(pending)
+
+def _take_out(doc_id: str) -> list:
+    #drops the document's content from memory (lock held); returns the spill
+    #to write, or marks it EVICTED when spilling is off
+    if doc_id in _spilling:
+        return []
+    file_handler._file_contents.pop(doc_id, None)
+    extract = _raw_extracts.pop(doc_id, None)
+    record = _sanitized_content.pop(doc_id, None)
+    _forget_document(doc_id)
+    if not spill_store.is_enabled():
+        _mark_evicted(doc_id)
+        return []
+    entry = (extract, record)
+    _spilling[doc_id] = entry
+    return [(doc_id, entry)]
+
+def _spill_document(doc_id: str, extract: Optional[dict], record: Optional[SanitizedRecord]) -> bool:
+    #moves extract and record to the encrypted tier; False if either failed
+    if extract is not None and not spill_store.spill(doc_id, SPILL_EXTRACT, json.dumps(extract).encode()):
+        return False
+    if record is not None and not spill_store.spill(doc_id, SPILL_RECORD, record.to_bytes()):
+        spill_store.discard(doc_id)
+        return False
+    return True
+
+def _is_pending(doc_id: str, entry: tuple) -> bool:
+    with _budget_lock:
+        return _spilling.get(doc_id) is entry
+
+def _write_spills(pending: list) -> None:
+    #compress, encrypt and write without the budget lock; a document read,
+    #written or cleaned up meanwhile took its content back and is skipped
+    global _spilled_count
+    for doc_id, entry in pending:
+        with _spill_io_lock:
+            if not _is_pending(doc_id, entry):
+                continue
+            spilled = _spill_document(doc_id, *entry)
+            with _budget_lock:
+                if _spilling.get(doc_id) is not entry:
+                    #memory is authoritative again for what was just written
+                    if spilled:
+                        for kind, value in zip((SPILL_EXTRACT, SPILL_RECORD), entry):
+                            if value is not None:
+                                spill_store.discard(doc_id, kind)
+                    continue
+                del _spilling[doc_id]
+                if spilled:
+                    _spilled_count += 1
+                else:
+                    _mark_evicted(doc_id)
+
+def _reclaim(doc_id: str) -> bool:
+    #takes back content whose spill has not been written yet
+    with _budget_lock:
+        entry = _spilling.pop(doc_id, None)
+        if entry is None:
+            return False
+        extract, record = entry
+        if extract is not None:
+            _raw_extracts[doc_id] = extract
+        if record is not None:
+            _sanitized_content[doc_id] = record
+        return True
+
+def _mark_evicted(doc_id: str) -> None:
+    global _evicted_count
+    _document_states[doc_id] = DocumentState.EVICTED
+    file_handler.update_document_status(doc_id, DocumentState.EVICTED.value)
+    _evicted_count += 1
+
+def evict_document(doc_id: str) -> None:
+    #moves the document out of memory: to the spill tier when possible
+    #(faulted back in on access, state unchanged), otherwise drops its content
+    #but keeps state/metadata so clients see EVICTED instead of a 404
+    with _budget_lock:
+        pending = _take_out(doc_id)
+    _write_spills(pending)
+
+def _fault_in(doc_id: str, kind: str, store: dict, decode) -> None:
+    #reload a spilled entry into memory (may evict other documents)
+    with _budget_lock:
+        if doc_id in store:
+            return
+        if not _reclaim(doc_id):
+            if not spill_store.contains(doc_id, kind):
+                return
+            payload = spill_store.load(doc_id, kind)
+            if payload is None:
+                #key dropped or file unreadable: the content is gone
+                spill_store.discard(doc_id)
+                _raw_extracts.pop(doc_id, None)
+                _sanitized_content.pop(doc_id, None)
+                _forget_document(doc_id)
+                _mark_evicted(doc_id)
+                return
+            store[doc_id] = decode(payload)
+    account_document(doc_id)
+
+def wipe_spilled() -> None:
+    #on lock: spilled documents cannot be decrypted any more
+    with _budget_lock:
+        for doc_id in set(spill_store.list_documents(SPILL_RECORD) + spill_store.list_documents(SPILL_EXTRACT)):
+            _mark_evicted(doc_id)
+        spill_store.clear_session_key()
+
+def _own(doc_id: str) -> str:
+    #copy-on-write for deduplicated uploads (see file_handler): a re-upload
+    #that writes results of its own stops sharing, starting from the state,
+    #bytes, extract and record of the document it shared with (references,
+    #not copies; all are replaced rather than mutated). Until then each
+    #holder is counted against the budget separately.
+    if _reclaim(doc_id):
+        account_document(doc_id)
+    owner = file_handler.detach_document(doc_id)
+    if owner is None:
+        return doc_id
+    if owner in _document_states:
+        _document_states[doc_id] = _document_states[owner]
+    content = file_handler._file_contents.get(owner)
+    if content is not None:
+        file_handler._file_contents[doc_id] = content
+    extract = get_raw_extract(owner)
+    if extract is not None:
+        _raw_extracts[doc_id] = extract
+    record = get_sanitized_record(owner)
+    if record is not None:
+        _sanitized_content[doc_id] = record
+    account_document(doc_id)
+    return doc_id
 
 def store_raw_extract(doc_id: str, extract: dict) -> None:
+    doc_id = _own(doc_id)
     _raw_extracts[doc_id] = extract
+    account_document(doc_id)
 
 def get_raw_extract(doc_id: str) -> Optional[dict]:
+    doc_id = file_handler.resolve_document(doc_id)
+    _fault_in(doc_id, SPILL_EXTRACT, _raw_extracts, json.loads)
+    touch_document(doc_id)
     return _raw_extracts.get(doc_id)
 
 def clear_raw_extract(doc_id: str) -> None:
+    doc_id = _own(doc_id)
+    spill_store.discard(doc_id, SPILL_EXTRACT)
     if doc_id in _raw_extracts:
         del _raw_extracts[doc_id]
+        account_document(doc_id)
 
-def store_sanitized_content(doc_id: str, redaction_map) -> None:
-    _sanitized_content[doc_id] = redaction_map
+def store_sanitized_content(doc_id: str, content: Union[RedactionMap, SanitizedRecord]) -> None:
+    if isinstance(content, RedactionMap):
+        content = SanitizedRecord.from_redaction_map(content)
+    doc_id = _own(doc_id)
+    _sanitized_content[doc_id] = content
+    account_document(doc_id)
 
-def get_sanitized_content(doc_id: str):
+def get_sanitized_record(doc_id: str) -> Optional[SanitizedRecord]:
+    doc_id = file_handler.resolve_document(doc_id)
+    _fault_in(doc_id, SPILL_RECORD, _sanitized_content, SanitizedRecord.from_bytes)
+    touch_document(doc_id)
     return _sanitized_content.get(doc_id)
 
+def get_offset_map(doc_id: str) -> Optional[OffsetMap]:
+    #original <-> redacted positions of a sanitized document
+    record = get_sanitized_record(doc_id)
+    return record.offsets if record is not None else None
+
+def get_sanitized_content(doc_id: str) -> Optional[RedactionMap]:
+    #API boundary: entities are materialized as pydantic models per call
+    record = get_sanitized_record(doc_id)
+    return record.to_redaction_map() if record is not None else None
+
 def clear_sanitized_content(doc_id: str) -> None:
+    doc_id = _own(doc_id)
+    spill_store.discard(doc_id, SPILL_RECORD)
     if doc_id in _sanitized_content:
         del _sanitized_content[doc_id]
+        account_document(doc_id)
 
 def list_sanitized_documents() -> List[str]:
-    return list(_sanitized_content.keys())
+    #includes spilled documents (loaded when read) and re-uploads sharing a
+    #sanitized document's results; owners whose own document was cleaned up
+    #only hold content for their re-uploads and are not listed
+    spilled = [doc_id for doc_id in spill_store.list_documents(SPILL_RECORD) if doc_id not in _sanitized_content]
+    with _budget_lock:
+        spilling = [doc_id for doc_id, (_, record) in _spilling.items() if record is not None]
+    owners = list(_sanitized_content.keys()) + [doc_id for doc_id in spilling if doc_id not in spilled] + spilled
+    sanitized = set(owners)
+    aliases = [alias for alias, owner in file_handler.list_aliases() if owner in sanitized]
+    return [doc_id for doc_id in owners if not file_handler.is_released(doc_id)] + aliases
 
 def get_document_state(doc_id: str) -> Optional[DocumentState]:
-    return _document_states.get(doc_id)
+    return _document_states.get(file_handler.resolve_document(doc_id))
 
 def set_document_state(doc_id: str, state: DocumentState) -> None:
-    _document_states[doc_id] = state
+    _document_states[_own(doc_id)] = state
 
 def transition_state(doc_id: str, new_state: DocumentState) -> None:
+    doc_id = _own(doc_id)
     #lifecycle hooks on state transitions
     if new_state == DocumentState.PARSED:
         #file bytes no longer needed after parsing
@@ -56,13 +324,21 @@ def transition_state(doc_id: str, new_state: DocumentState) -> None:
         #raw extract no longer needed after sanitization
         clear_raw_extract(doc_id)
     _document_states[doc_id] = new_state
+    if new_state in EVICTABLE_STATES:
+        #finished documents become candidates for eviction
+        _enforce_budget(keep=doc_id)
 
 def cleanup_document(doc_id: str) -> None:
-    file_handler.clear_file_content(doc_id)
-    clear_raw_extract(doc_id)
-    clear_sanitized_content(doc_id)
-    if doc_id in _document_states:
-        del _document_states[doc_id]
+    #deduplicated uploads share content: it is freed with its last reference
+    owner = file_handler.release_document(doc_id)
+    if owner is not None:
+        file_handler.clear_file_content(owner)
+        clear_raw_extract(owner)
+        clear_sanitized_content(owner)
+        _forget_document(owner)
+        if owner in _document_states:
+            del _document_states[owner]
+    llm_gate.unregister_document(doc_id)
     #late import to avoid circular dependency
     from app.services import review_manager
     review_manager.clear_status(doc_id)
@@ -72,13 +348,72 @@ def get_memory_stats() -> dict:
         "file_contents_count": len(file_handler._file_contents),
         "raw_extracts_count": len(_raw_extracts),
         "sanitized_content_count": len(_sanitized_content),
-        "document_states_count": len(_document_states)
+        "document_states_count": len(_document_states),
+        "tracked_bytes": _total_bytes,
+        "tracked_peak_bytes": _peak_bytes,
+        "memory_budget_bytes": MEMORY_BUDGET_BYTES,
+        "evicted_count": _evicted_count,
+        "spilled_count": _spilled_count,
+        "spill": spill_store.get_stats(),
+        "dedup": file_handler.get_dedup_stats()
     }
 
+def get_memory_usage(per_document: bool = False) -> dict:
+    #byte accounting: payload bytes per store (computed now, not the tracked
+    #totals), gate fingerprints, caches and the process resident set
+    with _budget_lock:
+        doc_ids = list(_document_bytes) + [
+            doc_id for doc_id in set(file_handler._file_contents) | set(_raw_extracts) | set(_sanitized_content)
+            if doc_id not in _document_bytes
+        ]
+        documents = {doc_id: document_usage(doc_id) for doc_id in doc_ids}
+        stores = {
+            name: sum(usage[name] for usage in documents.values())
+            for name in ("file_bytes", "extract_bytes", "sanitized_bytes")
+        }
+        usage = {
+            "stores": {**stores, "total": sum(stores.values())},
+            "redacted_cache_bytes": entity_table.redacted_cache_bytes(),
+            "gate": llm_gate.get_registry_bytes(),
+            "spill_bytes": spill_store.get_stats()["bytes"],
+            "tracked_bytes": _total_bytes,
+            "tracked_peak_bytes": _peak_bytes,
+            "memory_budget_bytes": MEMORY_BUDGET_BYTES,
+            "process": process_memory()
+        }
+        if per_document:
+            #documents whose content left memory may still hold gate fingerprints
+            for doc_id in llm_gate.list_registered_documents():
+                if doc_id not in documents:
+                    documents[doc_id] = dict.fromkeys(stores, 0)
+            rows = []
+            for doc_id, doc_usage in documents.items():
+                state = _document_states.get(doc_id)
+                gate_bytes = llm_gate.get_document_registry_bytes(doc_id)["total"]
+                rows.append({
+                    "document_id": doc_id,
+                    "state": state.value if state is not None else None,
+                    **doc_usage,
+                    "gate_bytes": gate_bytes,
+                    "total_bytes": sum(doc_usage.values()) + gate_bytes
+                })
+            #largest first
+            usage["documents"] = sorted(rows, key=lambda row: row["total_bytes"], reverse=True)
+        return usage
+
 def clear_all() -> None:
+    global _total_bytes, _peak_bytes, _evicted_count, _spilled_count
     _document_states.clear()
     _raw_extracts.clear()
     _sanitized_content.clear()
+    with _budget_lock:
+        _spilling.clear()
+        _document_bytes.clear()
+        _total_bytes = 0
+        _peak_bytes = 0
+        _evicted_count = 0
+        _spilled_count = 0
+    spill_store.wipe_all()
     #late import to avoid circular dependency
     from app.services import review_manager
     review_manager.clear_all_status()
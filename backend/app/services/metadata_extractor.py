@@ -11,22 +11,22 @@ from app.models.metadata import (
     TXTMetadata
 )
 from app.models.redaction import RedactionMap
+from app.core.text_index import TextIndex, get_index
 
-def _analyze_structure(text: str) -> StructureInfo:
+def _analyze_structure(text: str, index: Optional[TextIndex] = None) -> StructureInfo:
     #analyze text structure without retaining content
+    #counts come from the shared TextIndex, no words are copied out
     if not text:
         return StructureInfo()
+    index = get_index(text, index)
     #count paragraphs (separated by blank lines)
-    paragraphs = [p for p in re.split(r'\n\s*\n', text) if p.strip()]
-    paragraph_count = len(paragraphs)
+    paragraph_count = index.paragraph_count()
     #count sentences (approximate - ends with .!?)
-    sentences = re.findall(r'[^.!?]+[.!?]', text)
-    sentence_count = len(sentences)
+    sentence_count = index.sentence_count
     #count words
-    words = text.split()
-    word_count = len(words)
+    word_count = index.token_count
     #compute averages
-    avg_word_length = sum(len(w) for w in words) / word_count if word_count > 0 else 0.0
+    avg_word_length = index.total_token_chars() / word_count if word_count > 0 else 0.0
     avg_sentence_length = word_count / sentence_count if sentence_count > 0 else 0.0
     return StructureInfo(
         paragraph_count=paragraph_count,
@@ -57,7 +57,8 @@ def extract_metadata(
     raw_extract: dict,
     file_size: int,
     sha256: str,
-    redaction_map: Optional[RedactionMap] = None
+    redaction_map: Optional[RedactionMap] = None,
+    index: Optional[TextIndex] = None
 ) -> MetadataSchema:
     #extract LLM-safe metadata from raw extract
     #returns counts, types, structure - no recoverable text
@@ -65,7 +66,7 @@ def extract_metadata(
     parser_metadata = raw_extract.get("metadata", {})
     file_type = parser_metadata.get("file_type", "unknown")
     #analyze structure from text (counts only)
-    structure = _analyze_structure(text)
+    structure = _analyze_structure(text, index)
     #summarize entities (counts only)
     entities = _summarize_entities(redaction_map)
     #build file-type specific metadata
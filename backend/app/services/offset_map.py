@@ -0,0 +1,104 @@
+from array import array
+from bisect import bisect_right
+from typing import Iterable, List, Tuple
+from app.models.redaction import DetectedEntity
+
+#(original_start, original_end, redacted_start, redacted_end) per replaced span
+OffsetSpan = Tuple[int, int, int, int]
+
+def redact_spans(text: str, spans: Iterable[Tuple[int, int, str]]) -> Tuple[str, List[OffsetSpan]]:
+    #one forward pass over start-sorted (start, end, placeholder): collect
+    #kept text and placeholders, join once
+    parts: List[str] = []
+    offsets: List[OffsetSpan] = []
+    cursor = 0
+    redacted_pos = 0
+    for start, end, placeholder in spans:
+        if start < cursor:
+            #overlaps a span already replaced (merge_entities prevents this)
+            continue
+        parts.append(text[cursor:start])
+        redacted_pos += start - cursor
+        parts.append(placeholder)
+        offsets.append((start, end, redacted_pos, redacted_pos + len(placeholder)))
+        redacted_pos += len(placeholder)
+        cursor = end
+    parts.append(text[cursor:])
+    return "".join(parts), offsets
+
+class OffsetMap:
+    #piecewise map between original and redacted positions: text between
+    #replaced spans shifts by a constant, so four int arrays of span bounds
+    #are enough and every lookup is one binary search
+    __slots__ = ("original_starts", "original_ends", "redacted_starts", "redacted_ends")
+
+    def __init__(self, spans: Iterable[OffsetSpan] = ()):
+        self.original_starts = array('q')
+        self.original_ends = array('q')
+        self.redacted_starts = array('q')
+        self.redacted_ends = array('q')
+        for o_start, o_end, r_start, r_end in spans:
+            self.original_starts.append(o_start)
+            self.original_ends.append(o_end)
+            self.redacted_starts.append(r_start)
+            self.redacted_ends.append(r_end)
+
+    @classmethod
+    def from_entities(cls, entities: List[DetectedEntity]) -> "OffsetMap":
+        #rebuild the map of an existing redaction (entities must not overlap)
+        spans = []
+        shift = 0
+        for entity in sorted(entities, key=lambda e: e.start):
+            r_start = entity.start + shift
+            r_end = r_start + len(entity.placeholder)
+            spans.append((entity.start, entity.end, r_start, r_end))
+            shift = r_end - entity.end
+        return cls(spans)
+
+    def __len__(self) -> int:
+        return len(self.original_starts)
+
+    @staticmethod
+    def _map(pos: int, starts, ends, other_starts, other_ends, round_up: bool) -> int:
+        i = bisect_right(starts, pos) - 1
+        if i < 0:
+            return pos
+        if pos >= ends[i]:
+            return other_ends[i] + (pos - ends[i])
+        if pos == starts[i] or not round_up:
+            #inside a replaced span: snap to its start (or end when rounding up)
+            return other_starts[i]
+        return other_ends[i]
+
+    def to_redacted(self, pos: int, round_up: bool = False) -> int:
+        return self._map(
+            pos, self.original_starts, self.original_ends,
+            self.redacted_starts, self.redacted_ends, round_up
+        )
+
+    def to_original(self, pos: int, round_up: bool = False) -> int:
+        return self._map(
+            pos, self.redacted_starts, self.redacted_ends,
+            self.original_starts, self.original_ends, round_up
+        )
+
+    def range_to_redacted(self, start: int, end: int) -> Tuple[int, int]:
+        #smallest redacted range covering original [start, end)
+        return self.to_redacted(start), self.to_redacted(end, round_up=True)
+
+    def range_to_original(self, start: int, end: int) -> Tuple[int, int]:
+        #smallest original range covering redacted [start, end), e.g. a citation
+        return self.to_original(start), self.to_original(end, round_up=True)
+
+    def spans_in_redacted(self, start: int, end: int) -> List[OffsetSpan]:
+        #replaced spans whose placeholder intersects redacted [start, end)
+        lo = bisect_right(self.redacted_ends, start)
+        result = []
+        for i in range(lo, len(self)):
+            if self.redacted_starts[i] >= end:
+                break
+            result.append((self.original_starts[i], self.original_ends[i], self.redacted_starts[i], self.redacted_ends[i]))
+        return result
+
+    def nbytes(self) -> int:
+        return 4 * self.original_starts.itemsize * len(self)
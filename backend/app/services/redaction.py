@@ -1,65 +1,114 @@
-from typing import List, Dict
+import os
+import re
+from typing import List, Dict, Iterable, Iterator, Optional, Tuple, Union
 from datetime import datetime
-from app.models.redaction import DetectedEntity, RedactionMap
+from app.models.redaction import DetectedEntity, RedactedSegment, RedactionMap
+from app.services import entity_lists
+from app.services.entity_merge import Span, merge_sorted, merge_spans, sorted_spans
+from app.services.entity_table import EntityRow, EntityTable, SanitizedRecord
+from app.services.offset_map import OffsetMap, OffsetSpan, redact_spans
 from app.services.sanitizer import PIIEntity
 from app.services.secret_detector import SecretEntity
 
-def merge_entities(pii_entities: List[PIIEntity], secret_entities: List[SecretEntity]) -> List[DetectedEntity]:
-    #convert to unified format
-    all_entities: List[Dict] = []
-    for e in pii_entities:
-        all_entities.append({
-            "entity_type": e.entity_type,
-            "source": "pii",
-            "start": e.start,
-            "end": e.end,
-            "confidence": e.score,
-            "original_text": e.text
-        })
-    for e in secret_entities:
-        all_entities.append({
-            "entity_type": e.secret_type,
-            "source": "secret",
-            "start": e.start,
-            "end": e.end,
-            "confidence": e.confidence,
-            "original_text": e.text
-        })
-    #sort by start position
-    all_entities.sort(key=lambda x: (x["start"], -x["confidence"]))
+#identical (type, value) pairs share one placeholder, e.g. an email repeated
+#across a CSV stays [EMAIL_ADDRESS_1] everywhere (per call: intern=True/False)
+INTERN_PLACEHOLDERS = os.environ.get("SIFTLOCAL_INTERN_PLACEHOLDERS", "0") == "1"
+
+def _apply_entity_lists(spans: List[Span], text: str) -> List[Span]:
+    #one automaton pass over text: drop spans inside allow-listed values,
+    #add deny-listed terms as spans that win every overlap
+    allow, deny = entity_lists.find_terms(text)
+    if allow:
+        kept = []
+        allow.sort()
+        a = 0
+        allow_end = -1
+        for span in spans:
+            while a < len(allow) and allow[a][0] <= span[0]:
+                allow_end = max(allow_end, allow[a][1])
+                a += 1
+            if span[1] > allow_end:
+                kept.append(span)
+        spans = kept
+    if deny:
+        #automaton matches come out in end order
+        forced = sorted(
+            (start, end, entity_lists.DENY_CONFIDENCE, entity_type, "pii", text[start:end])
+            for start, end, entity_type in deny
+        )
+        spans = list(merge_sorted(forced, spans))
+    return spans
+
+def merge_rows(
+    pii_entities: List[PIIEntity],
+    secret_entities: List[SecretEntity],
+    text: Optional[str] = None,
+    assign_placeholders: bool = False,
+    intern: bool = False,
+    numbering: Optional["_PlaceholderNumbering"] = None
+) -> Iterator[EntityRow]:
+    #merged entities as plain rows (start, end, confidence, type, source, value, placeholder)
+    #text enables the vault allow/deny lists (see entity_lists)
+    #intern reuses the placeholder of an identical earlier value
+    #numbering carries placeholder counters over from earlier calls (streaming)
+    pii_spans = sorted_spans([(e.start, e.end, e.score, e.entity_type, "pii", e.text) for e in pii_entities])
+    secret_spans = sorted_spans([(e.start, e.end, e.confidence, e.secret_type, "secret", e.text) for e in secret_entities])
+    spans = merge_sorted(pii_spans, secret_spans)
+    if text is not None:
+        spans = _apply_entity_lists(list(spans), text)
     #resolve overlaps
-    merged: List[Dict] = []
-    for entity in all_entities:
-        if not merged:
-            merged.append(entity)
-            continue
-        last = merged[-1]
-        #check overlap
-        if entity["start"] < last["end"]:
-            #overlap detected - keep higher confidence
-            if entity["confidence"] > last["confidence"]:
-                merged[-1] = entity
-            #else keep last (higher or equal confidence)
-        else:
-            merged.append(entity)
-    return [DetectedEntity(
-        entity_type=e["entity_type"],
-        source=e["source"],
-        start=e["start"],
-        end=e["end"],
-        confidence=e["confidence"],
-        original_text=e["original_text"],
-        placeholder=""
-    ) for e in merged]
-
-def generate_placeholders(entities: List[DetectedEntity]) -> List[DetectedEntity]:
+    numbering = numbering or _PlaceholderNumbering(intern)
+    for start, end, confidence, entity_type, source, original_text in merge_spans(spans):
+        placeholder = numbering.next(entity_type, original_text) if assign_placeholders else ""
+        yield start, end, confidence, entity_type, source, original_text, placeholder
+
+def merge_entities(
+    pii_entities: List[PIIEntity],
+    secret_entities: List[SecretEntity],
+    text: Optional[str] = None,
+    assign_placeholders: bool = False,
+    intern: bool = False
+) -> List[DetectedEntity]:
+    #assign_placeholders numbers entities here so each is built only once
+    return [
+        DetectedEntity(
+            entity_type=entity_type,
+            source=source,
+            start=start,
+            end=end,
+            confidence=confidence,
+            original_text=original_text,
+            placeholder=placeholder
+        )
+        for start, end, confidence, entity_type, source, original_text, placeholder
+        in merge_rows(pii_entities, secret_entities, text, assign_placeholders, intern)
+    ]
+
+class _PlaceholderNumbering:
+    #sequential [TYPE_N] per entity type; interned values keep their first number
+    def __init__(self, intern: bool = False):
+        self._counts: Dict[str, int] = {}
+        self._interned: Optional[Dict[Tuple[str, str], str]] = {} if intern else None
+
+    def next(self, entity_type: str, value: str) -> str:
+        if self._interned is not None:
+            placeholder = self._interned.get((entity_type, value))
+            if placeholder is not None:
+                return placeholder
+        count = self._counts.get(entity_type, 0) + 1
+        self._counts[entity_type] = count
+        placeholder = f"[{entity_type}_{count}]"
+        if self._interned is not None:
+            self._interned[(entity_type, value)] = placeholder
+        return placeholder
+
+def generate_placeholders(entities: List[DetectedEntity], intern: bool = False) -> List[DetectedEntity]:
     #count occurrences of each type for sequential numbering
-    type_counts: Dict[str, int] = {}
+    #intern gives identical values of a type the same placeholder
+    numbering = _PlaceholderNumbering(intern)
     result = []
     for entity in entities:
-        etype = entity.entity_type
-        type_counts[etype] = type_counts.get(etype, 0) + 1
-        placeholder = f"[{etype}_{type_counts[etype]}]"
+        placeholder = numbering.next(entity.entity_type, entity.original_text)
         result.append(DetectedEntity(
             entity_type=entity.entity_type,
             source=entity.source,
@@ -71,25 +120,83 @@ def generate_placeholders(entities: List[DetectedEntity]) -> List[DetectedEntity
         ))
     return result
 
-def apply_redaction(text: str, entities: List[DetectedEntity]) -> str:
+def apply_redaction_with_offsets(text: str, entities: List[DetectedEntity]) -> Tuple[str, List[OffsetSpan]]:
+    #returns the redacted text and where each replaced span landed in it
     if not entities:
-        return text
-    #sort by start position descending to replace from end first
-    sorted_entities = sorted(entities, key=lambda x: x.start, reverse=True)
-    result = text
-    for entity in sorted_entities:
-        result = result[:entity.start] + entity.placeholder + result[entity.end:]
-    return result
+        return text, []
+    ordered = sorted(entities, key=lambda x: x.start)
+    return redact_spans(text, ((e.start, e.end, e.placeholder) for e in ordered))
+
+def apply_redaction(text: str, entities: List[DetectedEntity]) -> str:
+    return apply_redaction_with_offsets(text, entities)[0]
+
+def apply_redaction_table(text: str, table: EntityTable) -> Tuple[str, List[OffsetSpan]]:
+    #same as apply_redaction_with_offsets straight from columns (rows are start-sorted)
+    return redact_spans(text, table.iter_spans())
+
+#any bracketed token without whitespace; the placeholder dict decides if it is ours
+_PLACEHOLDER_TOKEN = re.compile(r'\[[^\[\]\s]+\]')
+
+def placeholder_values(entities: List[DetectedEntity]) -> Dict[str, str]:
+    return {entity.placeholder: entity.original_text for entity in entities if entity.placeholder}
+
+def rehydrate(redacted_text: str, values: Dict[str, str]) -> str:
+    #one regex scan; unknown bracketed tokens are left as they are
+    if not values:
+        return redacted_text
+    return _PLACEHOLDER_TOKEN.sub(lambda m: values.get(m.group(), m.group()), redacted_text)
 
 def reverse_redaction(redacted_text: str, entities: List[DetectedEntity]) -> str:
-    result = redacted_text
-    for entity in entities:
-        result = result.replace(entity.placeholder, entity.original_text)
-    return result
+    return rehydrate(redacted_text, placeholder_values(entities))
+
+class StreamingRehydrator:
+    #rehydrates text arriving in chunks (e.g. a streamed LLM response);
+    #only a trailing partial "[TYPE_N" is held back until it can be resolved
+    def __init__(self, entities: List[DetectedEntity]):
+        self._values = placeholder_values(entities)
+        self._max_len = max((len(p) for p in self._values), default=0)
+        self._pending = ""
+
+    def feed(self, chunk: str) -> str:
+        buffer = self._pending + chunk
+        cut = len(buffer)
+        open_idx = buffer.rfind("[")
+        if open_idx != -1 and "]" not in buffer[open_idx:]:
+            tail = buffer[open_idx:]
+            #a tail that is already too long or has whitespace is not a placeholder
+            if len(tail) < self._max_len and not any(c.isspace() for c in tail):
+                cut = open_idx
+        self._pending = buffer[cut:]
+        return rehydrate(buffer[:cut], self._values)
 
-def generate_redaction_map(text: str, pii_entities: List[PIIEntity], secret_entities: List[SecretEntity]) -> RedactionMap:
-    merged = merge_entities(pii_entities, secret_entities)
-    with_placeholders = generate_placeholders(merged)
+    def flush(self) -> str:
+        rest = self._pending
+        self._pending = ""
+        return rehydrate(rest, self._values)
+
+def generate_redaction_record(
+    text: str,
+    pii_entities: List[PIIEntity],
+    secret_entities: List[SecretEntity],
+    intern: Optional[bool] = None
+) -> SanitizedRecord:
+    #columnar result for memory_manager; no per-entity pydantic objects
+    #entity values are slices of text and redacted text is re-derived on demand
+    intern = INTERN_PLACEHOLDERS if intern is None else intern
+    table = EntityTable.from_rows(
+        merge_rows(pii_entities, secret_entities, text, assign_placeholders=True, intern=intern), source_text=text
+    )
+    redacted, offsets = apply_redaction_table(text, table)
+    return SanitizedRecord(text, None, table, datetime.now(), OffsetMap(offsets), redacted)
+
+def generate_redaction_map(
+    text: str,
+    pii_entities: List[PIIEntity],
+    secret_entities: List[SecretEntity],
+    intern: Optional[bool] = None
+) -> RedactionMap:
+    intern = INTERN_PLACEHOLDERS if intern is None else intern
+    with_placeholders = merge_entities(pii_entities, secret_entities, text, assign_placeholders=True, intern=intern)
     redacted = apply_redaction(text, with_placeholders)
     return RedactionMap(
         original_text=text,
@@ -97,3 +204,54 @@ def generate_redaction_map(text: str, pii_entities: List[PIIEntity], secret_enti
         entities=with_placeholders,
         created_at=datetime.now()
     )
+
+class StreamingRedactor:
+    #redacts a document segment by segment (pages, row batches) as the parser
+    #produces them; placeholder numbering (and interning) carries across
+    #segments, so the output matches redacting the concatenated text, but
+    #only one segment and its entities are held at a time
+    def __init__(self, intern: Optional[bool] = None):
+        self._numbering = _PlaceholderNumbering(INTERN_PLACEHOLDERS if intern is None else intern)
+        self._index = 0
+        self._offset = 0
+
+    def redact_segment(
+        self,
+        segment: str,
+        entities: Iterable[Union[PIIEntity, SecretEntity]]
+    ) -> RedactedSegment:
+        #entity offsets are relative to segment; returned ones are document offsets
+        entities = list(entities)
+        pii = [e for e in entities if isinstance(e, PIIEntity)]
+        secrets = [e for e in entities if isinstance(e, SecretEntity)]
+        rows = list(merge_rows(pii, secrets, segment, assign_placeholders=True, numbering=self._numbering))
+        redacted, _ = redact_spans(segment, ((start, end, placeholder) for start, end, *_, placeholder in rows))
+        offset = self._offset
+        result = RedactedSegment(
+            index=self._index,
+            offset=offset,
+            redacted_text=redacted,
+            entities=[
+                DetectedEntity(
+                    entity_type=entity_type,
+                    source=source,
+                    start=offset + start,
+                    end=offset + end,
+                    confidence=confidence,
+                    original_text=original_text,
+                    placeholder=placeholder
+                )
+                for start, end, confidence, entity_type, source, original_text, placeholder in rows
+            ]
+        )
+        self._index += 1
+        self._offset += len(segment)
+        return result
+
+    def redact(
+        self,
+        segments: Iterable[Tuple[str, List[Union[PIIEntity, SecretEntity]]]]
+    ) -> Iterator[RedactedSegment]:
+        #lazily redacts (segment, entities) pairs; consumes the input as it goes
+        for segment, entities in segments:
+            yield self.redact_segment(segment, entities)
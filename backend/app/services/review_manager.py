@@ -1,5 +1,5 @@
 from typing import Literal, List, Dict, Optional
-from app.services.memory_manager import list_sanitized_documents, get_sanitized_content
+from app.services.memory_manager import list_sanitized_documents, get_sanitized_record
 
 ChunkStatus = Literal["pending", "approved", "rejected"]
 
@@ -11,7 +11,7 @@ def get_chunk_status(chunk_id: str) -> ChunkStatus:
 
 def set_chunk_status(chunk_id: str, status: ChunkStatus) -> bool:
     #verify chunk exists in sanitized content
-    if not get_sanitized_content(chunk_id):
+    if get_sanitized_record(chunk_id) is None:
         return False
     _chunk_status[chunk_id] = status
     return True
@@ -1,6 +1,12 @@
+import asyncio
+import os
+import re
 from pydantic import BaseModel
-from typing import List, Optional
-from presidio_analyzer import AnalyzerEngine
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from presidio_analyzer import AnalyzerEngine, EntityRecognizer, RecognizerRegistry, RecognizerResult
+from presidio_analyzer.predefined_recognizers import SpacyRecognizer
+from app.core.text_index import TextIndex
+from app.services import analyzer_pool, detection_cache, language_router
 
 class PIIEntity(BaseModel):
     entity_type: str
@@ -9,25 +15,424 @@ class PIIEntity(BaseModel):
     score: float
     text: str
 
-_analyzer: Optional[AnalyzerEngine] = None
+#texts per spaCy nlp.pipe batch
+DEFAULT_BATCH_SIZE = 32
+#documents longer than this are analyzed in windows
+#(spaCy refuses >1M chars and memory grows superlinearly well before that)
+MAX_WINDOW_CHARS = 100_000
+#chars shared by neighbouring windows so boundary entities are seen whole
+WINDOW_OVERLAP = 1_000
+#paragraphs (cache segments) are separated by blank lines
+_PARAGRAPH_BREAK = re.compile(r'\n\s*\n')
 
-def get_analyzer() -> AnalyzerEngine:
-    global _analyzer
-    if _analyzer is None:
-        _analyzer = AnalyzerEngine()
-    return _analyzer
+class DetectionProfile(BaseModel):
+    name: str
+    model_name: str
+    #spaCy components not loaded (presidio only uses tokens, lemmas and NER)
+    excluded_components: List[str] = []
+    #entity types to detect (None = every recognizer)
+    entities: Optional[List[str]] = None
+    #False skips spaCy and runs only the pattern/regex recognizers
+    use_nlp: bool = True
+    #True runs NER only on paragraphs that look like prose (see is_prose)
+    tiered: bool = False
 
-def detect_pii(text: str, score_threshold: float = 0.5) -> List[PIIEntity]:
-    analyzer = get_analyzer()
-    results = analyzer.analyze(text=text, language="en")
+PROFILES: Dict[str, DetectionProfile] = {
+    #full lg pipeline, every recognizer
+    "accurate": DetectionProfile(name="accurate", model_name="en_core_web_lg"),
+    #no dependency parser, high-value entity types only
+    "balanced": DetectionProfile(
+        name="balanced",
+        model_name="en_core_web_lg",
+        excluded_components=["parser"],
+        entities=[
+            "PERSON", "LOCATION", "EMAIL_ADDRESS", "PHONE_NUMBER", "US_SSN",
+            "CREDIT_CARD", "IBAN_CODE", "IP_ADDRESS", "US_BANK_NUMBER",
+            "US_PASSPORT", "US_DRIVER_LICENSE"
+        ]
+    ),
+    #regex recognizers only: no NER (misses names/places), no context boosts
+    "fast": DetectionProfile(name="fast", model_name="", use_nlp=False),
+    #lg pipeline on prose paragraphs, regex recognizers on tables/code/numbers
+    "tiered": DetectionProfile(name="tiered", model_name="en_core_web_lg", tiered=True),
+}
+DEFAULT_PROFILE = os.environ.get("SIFTLOCAL_PII_PROFILE", "accurate")
+#language argument that detects the language of each text/window instead
+AUTO_LANGUAGE = "auto"
+
+#prose classifier thresholds (share of whitespace tokens / non-space chars)
+PROSE_MIN_ALPHA_SHARE = 0.6
+PROSE_MAX_DIGIT_SHARE = 0.2
+PROSE_MAX_SYMBOL_SHARE = 0.05
+PROSE_MAX_UPPER_SHARE = 0.5
+#chars typical of code, markup and tables but rare in sentences
+_SYMBOL_CHARS = frozenset("{}[]<>=;|\\_/#$%^&*~`+")
+
+#pattern recognizers for the regex-only profile
+#(NLP analyzers live in language_router, shared by profiles that match)
+_pattern_recognizers: Optional[List[EntityRecognizer]] = None
+
+def get_profile(profile: Optional[str] = None) -> DetectionProfile:
+    name = profile or DEFAULT_PROFILE
+    if name not in PROFILES:
+        raise ValueError(f"Unknown detection profile {name}. Available: {', '.join(PROFILES)}")
+    return PROFILES[name]
+
+def get_analyzer(profile: Optional[str] = None, language: str = language_router.DEFAULT_LANGUAGE) -> AnalyzerEngine:
+    #profiles name the English model; other languages use language_router.LANGUAGE_MODELS
+    config = get_profile(profile)
+    if not config.use_nlp:
+        raise ValueError(f"Profile {config.name} does not use an NLP analyzer")
+    model_name = config.model_name if language == language_router.DEFAULT_LANGUAGE else None
+    return language_router.get_analyzer(language, model_name, tuple(config.excluded_components))
+
+def _resolve_language(text: str, language: str) -> str:
+    if language == AUTO_LANGUAGE:
+        return language_router.route_language(text)
+    return language
+
+def load_profile(profile: Optional[str] = None) -> None:
+    #load whatever the profile needs up front (model or regex recognizers)
+    config = get_profile(profile)
+    if config.use_nlp:
+        get_analyzer(config.name)
+    else:
+        _get_pattern_recognizers()
+
+def _get_pattern_recognizers() -> List[EntityRecognizer]:
+    global _pattern_recognizers
+    if _pattern_recognizers is None:
+        registry = RecognizerRegistry()
+        registry.load_predefined_recognizers(languages=["en"])
+        _pattern_recognizers = [
+            r for r in registry.get_recognizers("en", all_fields=True)
+            if not isinstance(r, SpacyRecognizer)
+        ]
+    return _pattern_recognizers
+
+def _analyze_patterns(text: str, config: DetectionProfile) -> List[RecognizerResult]:
+    results: List[RecognizerResult] = []
+    for recognizer in _get_pattern_recognizers():
+        entities = [e for e in recognizer.supported_entities if config.entities is None or e in config.entities]
+        if entities:
+            results.extend(recognizer.analyze(text=text, entities=entities, nlp_artifacts=None))
+    return EntityRecognizer.remove_duplicates(results)
+
+def is_prose(segment: str) -> bool:
+    #cheap natural-language check: mostly alphabetic words, few digits,
+    #few code/table symbols and not a run of all-caps labels
+    tokens = segment.split()
+    if not tokens:
+        return False
+    alpha = 0
+    upper = 0
+    for token in tokens:
+        core = token.strip(".,;:!?\"'()")
+        if core.isalpha():
+            alpha += 1
+            if len(core) > 1 and core.isupper():
+                upper += 1
+    chars = sum(len(token) for token in tokens)
+    digits = sum(c.isdigit() for c in segment)
+    symbols = sum(c in _SYMBOL_CHARS for c in segment)
+    return (
+        alpha / len(tokens) >= PROSE_MIN_ALPHA_SHARE
+        and digits / chars <= PROSE_MAX_DIGIT_SHARE
+        and symbols / chars <= PROSE_MAX_SYMBOL_SHARE
+        and upper / len(tokens) <= PROSE_MAX_UPPER_SHARE
+    )
+
+def _analyze_tiered(
+    text: str,
+    config: DetectionProfile,
+    language: str,
+    index: Optional[TextIndex] = None
+) -> List[RecognizerResult]:
+    #tier 1: regex recognizers on every paragraph that is not prose
+    #tier 2: full analyzer (NER + context-aware patterns) on prose paragraphs
+    results: List[RecognizerResult] = []
+    prose: List[Tuple[int, int]] = []
+    for p_start, p_end in _paragraph_bounds(text, index):
+        segment = text[p_start:p_end]
+        if is_prose(segment):
+            prose.append((p_start, p_end))
+            continue
+        for r in _analyze_patterns(segment, config):
+            r.start += p_start
+            r.end += p_start
+            results.append(r)
+    if prose:
+        analyzer = get_analyzer(config.name, language)
+        slices = (text[p_start:p_end] for p_start, p_end in prose)
+        batch = analyzer.nlp_engine.process_batch(slices, language=language, batch_size=DEFAULT_BATCH_SIZE)
+        for (p_start, _), (segment, nlp_artifacts) in zip(prose, batch):
+            for r in analyzer.analyze(text=segment, language=language, entities=config.entities, nlp_artifacts=nlp_artifacts):
+                r.start += p_start
+                r.end += p_start
+                results.append(r)
+    return results
+
+def _analyze(
+    text: str,
+    config: DetectionProfile,
+    language: str,
+    index: Optional[TextIndex] = None
+) -> List[RecognizerResult]:
+    #pattern recognizers are language-agnostic regexes and ignore language
+    if not config.use_nlp:
+        return _analyze_patterns(text, config)
+    language = _resolve_language(text, language)
+    if config.tiered:
+        return _analyze_tiered(text, config, language, index)
+    return get_analyzer(config.name, language).analyze(text=text, language=language, entities=config.entities)
+
+def _find_break(text: str, lo: int, hi: int) -> int:
+    #last paragraph break, else sentence end, else whitespace in [lo, hi)
+    idx = text.rfind("\n\n", lo, hi)
+    if idx != -1:
+        return idx + 2
+    idx = max(text.rfind(". ", lo, hi), text.rfind("! ", lo, hi), text.rfind("? ", lo, hi), text.rfind("\n", lo, hi))
+    if idx != -1:
+        return idx + 1
+    idx = text.rfind(" ", lo, hi)
+    if idx != -1:
+        return idx + 1
+    return hi
+
+def _split_windows(text: str, window_chars: int, overlap: int) -> List[Tuple[int, int]]:
+    #overlapping (start, end) windows cut on paragraph/sentence boundaries
+    n = len(text)
+    if n <= window_chars:
+        return [(0, n)]
+    windows = []
+    start = 0
+    while True:
+        end = min(start + window_chars, n)
+        if end < n:
+            end = _find_break(text, start + window_chars // 2, end)
+        windows.append((start, end))
+        if end >= n:
+            return windows
+        #step back into the previous window, starting on a word boundary
+        next_start = max(end - overlap, start + 1)
+        space = text.find(" ", next_start, end)
+        start = space + 1 if space != -1 else next_start
+
+def _to_pii_entities(
+    text: str,
+    results: List[RecognizerResult],
+    score_threshold: float,
+    offset: int = 0
+) -> List[PIIEntity]:
+    #results are relative to a window of text starting at offset
     entities = []
     for result in results:
         if result.score >= score_threshold:
+            start = result.start + offset
+            end = result.end + offset
             entities.append(PIIEntity(
                 entity_type=result.entity_type,
-                start=result.start,
-                end=result.end,
+                start=start,
+                end=end,
                 score=result.score,
-                text=text[result.start:result.end]
+                text=text[start:end]
             ))
     return entities
+
+def _merge_windows(window_entities: List[List[PIIEntity]]) -> List[PIIEntity]:
+    #a span cut by a window edge is contained in the copy the neighbouring
+    #window saw whole, so drop spans contained in one that only other windows
+    #reported; nested spans from the same window and lone truncated copies
+    #are kept (merge_entities resolves the overlaps later)
+    best: Dict[Tuple[int, int, str], PIIEntity] = {}
+    seen_in: Dict[Tuple[int, int, str], set] = {}
+    for i, entities in enumerate(window_entities):
+        for e in entities:
+            key = (e.start, e.end, e.entity_type)
+            if key not in best or e.score > best[key].score:
+                best[key] = e
+            seen_in.setdefault(key, set()).add(i)
+    #containers sort before what they contain
+    keys = sorted(best, key=lambda k: (k[0], -k[1]))
+    kept: List[Tuple[int, int, str]] = []
+    #kept spans that may still contain later ones
+    open_spans: List[Tuple[int, int, str]] = []
+    for key in keys:
+        start, end, _ = key
+        open_spans = [k for k in open_spans if k[1] > start]
+        if any(k[1] >= end and seen_in[k].isdisjoint(seen_in[key]) for k in open_spans):
+            continue
+        kept.append(key)
+        open_spans.append(key)
+    return sorted((best[k] for k in kept), key=lambda e: (e.start, e.end))
+
+def _analyze_stream(
+    texts: Iterable[str],
+    batch_size: int,
+    config: DetectionProfile,
+    language: str
+) -> Iterator[List[RecognizerResult]]:
+    #spaCy nlp.pipe over texts, then presidio recognizers on each parsed doc
+    #auto-detected texts may each need a different model, so go one by one
+    if not config.use_nlp or config.tiered or language == AUTO_LANGUAGE:
+        for text in texts:
+            yield _analyze(text, config, language)
+        return
+    analyzer = get_analyzer(config.name, language)
+    for text, nlp_artifacts in analyzer.nlp_engine.process_batch(texts, language=language, batch_size=batch_size):
+        yield analyzer.analyze(text=text, language=language, entities=config.entities, nlp_artifacts=nlp_artifacts)
+
+def _detect_pii_local(
+    text: str,
+    score_threshold: float,
+    profile: Optional[str] = None,
+    use_cache: bool = False,
+    language: str = language_router.DEFAULT_LANGUAGE,
+    index: Optional[TextIndex] = None
+) -> List[PIIEntity]:
+    config = get_profile(profile)
+    if use_cache:
+        return _detect_pii_cached(text, score_threshold, config, language, index)
+    windows = _split_windows(text, MAX_WINDOW_CHARS, WINDOW_OVERLAP)
+    if len(windows) == 1:
+        return _to_pii_entities(text, _analyze(text, config, language, index), score_threshold)
+    #one window in flight at a time keeps peak memory bounded
+    window_entities = []
+    for w_start, w_end in windows:
+        results = _analyze(text[w_start:w_end], config, language)
+        window_entities.append(_to_pii_entities(text, results, score_threshold, offset=w_start))
+    return _merge_windows(window_entities)
+
+def _detect_pii_batch_local(
+    texts: List[str],
+    score_threshold: float,
+    batch_size: int,
+    profile: Optional[str] = None,
+    language: str = language_router.DEFAULT_LANGUAGE
+) -> List[List[PIIEntity]]:
+    #long texts are windowed into the same nlp.pipe stream
+    config = get_profile(profile)
+    text_windows = [_split_windows(text, MAX_WINDOW_CHARS, WINDOW_OVERLAP) for text in texts]
+    slices = (text[w_start:w_end] for text, windows in zip(texts, text_windows) for w_start, w_end in windows)
+    stream = _analyze_stream(slices, batch_size, config, language)
+    output = []
+    for text, windows in zip(texts, text_windows):
+        window_entities = []
+        for w_start, w_end in windows:
+            results = next(stream)
+            window_entities.append(_to_pii_entities(text, results, score_threshold, offset=w_start))
+        if len(windows) == 1:
+            output.append(window_entities[0])
+        else:
+            output.append(_merge_windows(window_entities))
+    return output
+
+def _paragraph_bounds(text: str, index: Optional[TextIndex] = None) -> List[Tuple[int, int]]:
+    if index is not None and index.matches(text):
+        return index.paragraph_bounds()
+    bounds = []
+    start = 0
+    for match in _PARAGRAPH_BREAK.finditer(text):
+        bounds.append((start, match.start()))
+        start = match.end()
+    bounds.append((start, len(text)))
+    return bounds
+
+def _detect_pii_cached(
+    text: str,
+    score_threshold: float,
+    config: DetectionProfile,
+    language: str,
+    index: Optional[TextIndex] = None
+) -> List[PIIEntity]:
+    #per-paragraph detection; paragraphs seen before (signatures, footers,
+    #slide masters) reuse cached spans, the rest go through one nlp.pipe pass
+    #auto language is resolved once for the whole text so misses share a model
+    if config.use_nlp:
+        language = _resolve_language(text, language)
+    segments: List[Tuple[int, str]] = []
+    found: Dict[str, detection_cache.CachedSpans] = {}
+    pending: Dict[str, Tuple[int, int]] = {}
+    for p_start, p_end in _paragraph_bounds(text, index):
+        start, end = detection_cache.normalize_bounds(text, p_start, p_end)
+        if start == end:
+            continue
+        key = detection_cache.make_key(text[start:end], config.name, language)
+        segments.append((start, key))
+        if key in found or key in pending:
+            continue
+        spans = detection_cache.get(key)
+        if spans is None:
+            pending[key] = (start, end)
+        else:
+            found[key] = spans
+    if pending:
+        #cache every score; the threshold is applied per call below
+        misses = _detect_pii_batch_local(
+            [text[s:e] for s, e in pending.values()], 0.0, DEFAULT_BATCH_SIZE, config.name, language
+        )
+        for key, entities in zip(pending, misses):
+            spans = tuple((e.start, e.end, e.entity_type, e.score) for e in entities)
+            detection_cache.put(key, spans)
+            found[key] = spans
+    entities = []
+    for seg_start, key in segments:
+        for rel_start, rel_end, entity_type, score in found[key]:
+            if score >= score_threshold:
+                start = seg_start + rel_start
+                end = seg_start + rel_end
+                entities.append(PIIEntity(
+                    entity_type=entity_type,
+                    start=start,
+                    end=end,
+                    score=score,
+                    text=text[start:end]
+                ))
+    return entities
+
+def detect_pii(
+    text: str,
+    score_threshold: float = 0.5,
+    profile: Optional[str] = None,
+    use_cache: bool = False,
+    language: str = language_router.DEFAULT_LANGUAGE,
+    index: Optional[TextIndex] = None
+) -> List[PIIEntity]:
+    #profile picks the accuracy/speed trade-off (see PROFILES), per call
+    #use_cache analyzes per paragraph and skips NLP for repeated paragraphs
+    #language picks the spaCy model ("auto" detects it per text/window)
+    #index: the document's shared TextIndex (paragraph bounds are reused)
+    #dispatch to the worker pool when one is running
+    get_profile(profile)
+    if analyzer_pool.is_running():
+        return analyzer_pool.detect_pii(text, score_threshold, profile, use_cache, language, index)
+    return _detect_pii_local(text, score_threshold, profile, use_cache, language, index)
+
+async def detect_pii_async(
+    text: str,
+    score_threshold: float = 0.5,
+    profile: Optional[str] = None,
+    use_cache: bool = False,
+    language: str = language_router.DEFAULT_LANGUAGE,
+    index: Optional[TextIndex] = None
+) -> List[PIIEntity]:
+    get_profile(profile)
+    if analyzer_pool.is_running():
+        return await analyzer_pool.detect_pii_async(text, score_threshold, profile, use_cache, language, index)
+    return await asyncio.to_thread(_detect_pii_local, text, score_threshold, profile, use_cache, language, index)
+
+def detect_pii_batch(
+    texts: List[str],
+    score_threshold: float = 0.5,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    profile: Optional[str] = None,
+    language: str = language_router.DEFAULT_LANGUAGE
+) -> List[List[PIIEntity]]:
+    #run spaCy over all texts with nlp.pipe, then presidio recognizers per doc
+    #returns one entity list per input text, in input order
+    get_profile(profile)
+    if not texts:
+        return []
+    if analyzer_pool.is_running():
+        return analyzer_pool.detect_pii_batch(texts, score_threshold, batch_size, profile, language)
+    return _detect_pii_batch_local(texts, score_threshold, batch_size, profile, language)
@@ -1,7 +1,8 @@
 import re
 import math
 from pydantic import BaseModel
-from typing import List, Tuple, Pattern
+from typing import List, Optional, Tuple, Pattern
+from app.core.text_index import TextIndex, get_index
 
 class SecretPattern(BaseModel):
     name: str
@@ -71,7 +72,8 @@ def _is_overlapping(start: int, end: int, ranges: List[Tuple[int, int]]) -> bool
             return True
     return False
 
-def detect_secrets(text: str, min_confidence: float = 0.7) -> List[SecretEntity]:
+def detect_secrets(text: str, min_confidence: float = 0.7, index: Optional[TextIndex] = None) -> List[SecretEntity]:
+    #index: shared TextIndex of text (built here when not given)
     results = []
     compiled = _get_compiled_patterns()
     for sp, pattern in compiled:
@@ -96,13 +98,11 @@ def detect_secrets(text: str, min_confidence: float = 0.7) -> List[SecretEntity]
     #entropy detection for high-entropy strings
     if ENTROPY_CONFIDENCE >= min_confidence:
         covered_ranges = sorted([(r.start, r.end) for r in results])
-        for match in re.finditer(r'\S+', text):
-            word = match.group()
-            start, end = match.span()
-            if len(word) < MIN_TOKEN_LENGTH:
-                continue
+        #only tokens long enough to score are sliced out of the text
+        for start, end in get_index(text, index).iter_tokens(MIN_TOKEN_LENGTH):
             if _is_overlapping(start, end, covered_ranges):
                 continue
+            word = text[start:end]
             entropy = _shannon_entropy(word)
             if entropy > ENTROPY_THRESHOLD:
                 results.append(SecretEntity(
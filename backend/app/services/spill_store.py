@@ -0,0 +1,148 @@
+import os
+import secrets
+import shutil
+import tempfile
+import threading
+import zlib
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+#second tier for evicted documents: compressed, AES-GCM encrypted with the
+#session key and written to tmpfs (/dev/shm) when available; nothing here
+#is readable once the vault locks and the key is dropped
+SPILL_DIR = os.environ.get("SIFTLOCAL_SPILL_DIR", "")
+SPILL_ENABLED = os.environ.get("SIFTLOCAL_SPILL_ENABLED", "1") == "1"
+NONCE_BYTES = 12
+
+_lock = threading.Lock()
+_cipher: Optional[AESGCM] = None
+_directory: Optional[Path] = None
+#(doc id, kind) -> (file path, bytes on disk)
+_index: Dict[Tuple[str, str], Tuple[Path, int]] = {}
+_stats = {"spilled": 0, "faulted": 0, "failed": 0}
+
+def _spill_root() -> str:
+    if SPILL_DIR:
+        return SPILL_DIR
+    if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK):
+        return "/dev/shm"
+    return tempfile.gettempdir()
+
+def _get_directory() -> Path:
+    global _directory
+    if _directory is None:
+        #private per-process directory (mkdtemp creates it 0700)
+        _directory = Path(tempfile.mkdtemp(prefix="siftlocal-spill-", dir=_spill_root()))
+    return _directory
+
+def set_session_key(session_key: str) -> None:
+    #hex session key from derive_keys; spilled data never outlives it
+    global _cipher
+    with _lock:
+        _cipher = AESGCM(bytes.fromhex(session_key))
+
+def clear_session_key() -> None:
+    global _cipher
+    with _lock:
+        _cipher = None
+    wipe_all()
+
+def is_enabled() -> bool:
+    return SPILL_ENABLED and _cipher is not None
+
+def _aad(doc_id: str, kind: str) -> bytes:
+    #binds each file to its entry so files cannot be swapped
+    return f"{doc_id}\x00{kind}".encode()
+
+def spill(doc_id: str, kind: str, payload: bytes) -> bool:
+    #False when spilling is off, locked or the write failed (caller drops the data)
+    with _lock:
+        if not SPILL_ENABLED or _cipher is None:
+            return False
+        cipher = _cipher
+        directory = _get_directory()
+    #compress, encrypt and write outside the lock; only the index is shared
+    nonce = os.urandom(NONCE_BYTES)
+    sealed = nonce + cipher.encrypt(nonce, zlib.compress(payload, 1), _aad(doc_id, kind))
+    #random file name: doc ids do not show up on disk
+    path = directory / secrets.token_hex(16)
+    try:
+        with open(path, "wb") as f:
+            f.write(sealed)
+    except OSError:
+        with _lock:
+            _stats["failed"] += 1
+        return False
+    with _lock:
+        if _cipher is not cipher or _directory != directory:
+            #locked (and wiped) while writing
+            path.unlink(missing_ok=True)
+            return False
+        _discard_locked(doc_id, kind)
+        _index[(doc_id, kind)] = (path, len(sealed))
+        _stats["spilled"] += 1
+        return True
+
+def load(doc_id: str, kind: str) -> Optional[bytes]:
+    #decrypts and removes the entry (memory is authoritative again);
+    #None when nothing was spilled or it can no longer be read
+    with _lock:
+        entry = _index.pop((doc_id, kind), None)
+        if entry is None:
+            return None
+        path = entry[0]
+        try:
+            if _cipher is None:
+                return None
+            sealed = path.read_bytes()
+            payload = zlib.decompress(
+                _cipher.decrypt(sealed[:NONCE_BYTES], sealed[NONCE_BYTES:], _aad(doc_id, kind))
+            )
+        except (OSError, InvalidTag, zlib.error):
+            _stats["failed"] += 1
+            return None
+        finally:
+            path.unlink(missing_ok=True)
+        _stats["faulted"] += 1
+        return payload
+
+def contains(doc_id: str, kind: str) -> bool:
+    return (doc_id, kind) in _index
+
+def list_documents(kind: str) -> List[str]:
+    with _lock:
+        return [doc_id for doc_id, k in _index if k == kind]
+
+def _discard_locked(doc_id: str, kind: str) -> None:
+    entry = _index.pop((doc_id, kind), None)
+    if entry is not None:
+        entry[0].unlink(missing_ok=True)
+
+def discard(doc_id: str, kind: Optional[str] = None) -> None:
+    with _lock:
+        for key in [key for key in _index if key[0] == doc_id and (kind is None or key[1] == kind)]:
+            _discard_locked(*key)
+
+def wipe_all() -> None:
+    global _directory
+    with _lock:
+        _index.clear()
+        if _directory is not None:
+            shutil.rmtree(_directory, ignore_errors=True)
+            _directory = None
+
+def get_stats() -> dict:
+    with _lock:
+        return {
+            "enabled": SPILL_ENABLED and _cipher is not None,
+            "entries": len(_index),
+            "bytes": sum(size for _, size in _index.values()),
+            **_stats
+        }
+
+def reset_stats() -> None:
+    with _lock:
+        for key in _stats:
+            _stats[key] = 0
@@ -0,0 +1,101 @@
+from array import array
+from typing import Dict, Iterator, List, Optional, Tuple
+from app.services.sanitizer import PIIEntity, detect_pii_batch
+from app.services.secret_detector import SecretEntity, detect_secrets
+
+def iter_cells(text: str, delimiter: str = ",") -> Iterator[Tuple[int, int, int]]:
+    #yield (column, start, end) for every non-empty cell of CSV text
+    #quoted cells yield the span inside the quotes, so offsets stay absolute
+    n = len(text)
+    pos = 0
+    column = 0
+    while pos < n:
+        if text[pos] == '"':
+            #quoted field: "" is an escaped quote
+            start = pos + 1
+            pos = start
+            while pos < n:
+                if text[pos] == '"':
+                    if pos + 1 < n and text[pos + 1] == '"':
+                        pos += 2
+                        continue
+                    break
+                pos += 1
+            end = pos
+            pos += 1
+            #skip anything between the closing quote and the next separator
+            while pos < n and text[pos] not in (delimiter, "\n", "\r"):
+                pos += 1
+        else:
+            start = pos
+            while pos < n and text[pos] not in (delimiter, "\n", "\r"):
+                pos += 1
+            end = pos
+        if end > start:
+            yield column, start, end
+        if pos >= n:
+            return
+        if text[pos] == delimiter:
+            column += 1
+            pos += 1
+        else:
+            #row break (\n or \r\n)
+            if text[pos] == "\r" and pos + 1 < n and text[pos + 1] == "\n":
+                pos += 1
+            pos += 1
+            column = 0
+
+def collect_distinct_cells(text: str, delimiter: str = ",") -> Dict[int, Dict[str, array]]:
+    #column -> distinct cell value -> start offsets of every occurrence
+    columns: Dict[int, Dict[str, array]] = {}
+    for column, start, end in iter_cells(text, delimiter):
+        values = columns.setdefault(column, {})
+        value = text[start:end]
+        offsets = values.get(value)
+        if offsets is None:
+            offsets = values[value] = array("q")
+        offsets.append(start)
+    return columns
+
+def detect_tabular(
+    text: str,
+    score_threshold: float = 0.5,
+    min_confidence: float = 0.7,
+    profile: Optional[str] = None,
+    delimiter: str = ","
+) -> Tuple[List[PIIEntity], List[SecretEntity]]:
+    #analyze each distinct cell value once and project the entities onto every
+    #occurrence, so work scales with column cardinality instead of row count
+    #(cells are analyzed without their row/header context)
+    columns = collect_distinct_cells(text, delimiter)
+    distinct = list({value for values in columns.values() for value in values})
+    pii_by_value = dict(zip(distinct, detect_pii_batch(distinct, score_threshold, profile=profile)))
+    secrets_by_value = {value: detect_secrets(value, min_confidence) for value in distinct}
+    pii: List[PIIEntity] = []
+    secrets: List[SecretEntity] = []
+    for values in columns.values():
+        for value, offsets in values.items():
+            value_pii = pii_by_value[value]
+            value_secrets = secrets_by_value[value]
+            if not value_pii and not value_secrets:
+                continue
+            for offset in offsets:
+                for e in value_pii:
+                    pii.append(PIIEntity(
+                        entity_type=e.entity_type,
+                        start=offset + e.start,
+                        end=offset + e.end,
+                        score=e.score,
+                        text=e.text
+                    ))
+                for e in value_secrets:
+                    secrets.append(SecretEntity(
+                        secret_type=e.secret_type,
+                        start=offset + e.start,
+                        end=offset + e.end,
+                        confidence=e.confidence,
+                        text=e.text
+                    ))
+    pii.sort(key=lambda e: e.start)
+    secrets.sort(key=lambda e: e.start)
+    return pii, secrets
@@ -0,0 +1,55 @@
+import asyncio
+import time
+from typing import Callable, Dict, Optional
+from app.models.health import ComponentStatus
+from app.services.sanitizer import detect_pii
+from app.services.secret_detector import detect_secrets
+
+#synthetic text for the warm-up inference (exercises NER and regex recognizers)
+WARMUP_TEXT = "Contact John Smith at john.smith@example.com or 555-123-4567 in Boston."
+
+#load state per component, reported by /ready
+_components: Dict[str, ComponentStatus] = {
+    "secret_patterns": ComponentStatus(),
+    "analyzer": ComponentStatus(),
+}
+_warmup_task: Optional[asyncio.Task] = None
+
+def _load(name: str, loader: Callable[[], object]) -> None:
+    status = _components[name]
+    status.state = "loading"
+    started = time.perf_counter()
+    try:
+        loader()
+    except Exception as e:
+        status.state = "error"
+        status.error = str(e)
+    else:
+        status.state = "ready"
+    status.load_seconds = round(time.perf_counter() - started, 3)
+
+def warm_up() -> None:
+    #compiles secret patterns, then loads the analyzer with one real inference
+    #(in the worker pool when running, so the forkserver preload happens here)
+    _load("secret_patterns", lambda: detect_secrets(WARMUP_TEXT))
+    _load("analyzer", lambda: detect_pii(WARMUP_TEXT))
+
+def start_warmup() -> asyncio.Task:
+    #run warm-up off the event loop so /health answers while models load
+    global _warmup_task
+    if _warmup_task is None:
+        _warmup_task = asyncio.create_task(asyncio.to_thread(warm_up))
+    return _warmup_task
+
+def is_ready() -> bool:
+    return all(status.state == "ready" for status in _components.values())
+
+def get_component_status() -> Dict[str, ComponentStatus]:
+    return {name: status.model_copy() for name, status in _components.items()}
+
+def reset() -> None:
+    #forget load state (for testing)
+    global _warmup_task
+    _warmup_task = None
+    for name in _components:
+        _components[name] = ComponentStatus()
@@ -0,0 +1,43 @@
+import random
+import sys
+import time
+from app.services.redaction import merge_entities
+from app.services.sanitizer import PIIEntity
+from app.services.secret_detector import SecretEntity
+
+#merge_entities on heavily overlapping PII + secret spans
+#usage: python -m benchmarks.bench_merge [entity_count]
+
+TYPES = ["PERSON", "LOCATION", "EMAIL_ADDRESS", "PHONE_NUMBER", "US_SSN"]
+
+def overlapping_entities(count: int, seed: int = 7):
+    #every span overlaps its neighbours (stride 6, length 5..20)
+    rng = random.Random(seed)
+    pii = []
+    secrets = []
+    for i in range(count):
+        start = i * 6
+        end = start + rng.randint(5, 20)
+        if i % 4 == 3:
+            secrets.append(SecretEntity(
+                secret_type="HIGH_ENTROPY_STRING", start=start, end=end,
+                confidence=rng.random(), text="x" * (end - start)
+            ))
+        else:
+            pii.append(PIIEntity(
+                entity_type=rng.choice(TYPES), start=start, end=end,
+                score=rng.random(), text="x" * (end - start)
+            ))
+    return pii, secrets
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    pii, secrets = overlapping_entities(count)
+    start = time.perf_counter()
+    merged = merge_entities(pii, secrets, assign_placeholders=True)
+    secs = time.perf_counter() - start
+    assert all(a.end <= b.start for a, b in zip(merged, merged[1:]))
+    print(f"entities={count} kept={len(merged)} merge={secs * 1000:.1f} ms ({count / secs:,.0f} entities/s)")
+
+if __name__ == "__main__":
+    main()
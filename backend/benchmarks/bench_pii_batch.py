@@ -0,0 +1,32 @@
+import sys
+import time
+from app.services.sanitizer import detect_pii, detect_pii_batch, load_profile
+from benchmarks.corpus import texts
+
+#compare per-text detect_pii against batched nlp.pipe path
+#usage: python -m benchmarks.bench_pii_batch [doc_count] [batch_size]
+
+def main():
+    doc_count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    batch_size = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+    corpus = texts(doc_count)
+    #load model before timing
+    load_profile()
+    detect_pii(corpus[0])
+    start = time.perf_counter()
+    single = [detect_pii(text) for text in corpus]
+    single_secs = time.perf_counter() - start
+    start = time.perf_counter()
+    batched = detect_pii_batch(corpus, batch_size=batch_size)
+    batch_secs = time.perf_counter() - start
+    same = all(
+        [(e.entity_type, e.start, e.end) for e in a] == [(e.entity_type, e.start, e.end) for e in b]
+        for a, b in zip(single, batched)
+    )
+    print(f"docs={doc_count} batch_size={batch_size}")
+    print(f"single: {single_secs:.2f}s ({doc_count / single_secs:.1f} docs/s)")
+    print(f"batch:  {batch_secs:.2f}s ({doc_count / batch_secs:.1f} docs/s)")
+    print(f"speedup: {single_secs / batch_secs:.2f}x, identical results: {same}")
+
+if __name__ == "__main__":
+    main()
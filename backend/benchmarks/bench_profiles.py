@@ -0,0 +1,39 @@
+import sys
+import time
+from typing import List, Tuple
+from app.services.sanitizer import PROFILES, PIIEntity, detect_pii_batch, load_profile
+from benchmarks.corpus import labeled_corpus
+
+#recall and throughput of each detection profile on the labeled corpus
+#usage: python -m benchmarks.bench_profiles [doc_count]
+
+def _recall(labels: List[List[Tuple[int, int, str]]], found: List[List[PIIEntity]]) -> dict:
+    #a label counts as found if an entity of the same type overlaps it
+    per_type: dict = {}
+    for sample_labels, entities in zip(labels, found):
+        for start, end, entity_type in sample_labels:
+            hit = any(e.entity_type == entity_type and e.start < end and start < e.end for e in entities)
+            total, hits = per_type.get(entity_type, (0, 0))
+            per_type[entity_type] = (total + 1, hits + int(hit))
+    return per_type
+
+def main():
+    doc_count = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    corpus = labeled_corpus(doc_count)
+    texts = [text for text, _ in corpus]
+    labels = [sample_labels for _, sample_labels in corpus]
+    for name in PROFILES:
+        #model load is not part of throughput
+        load_profile(name)
+        detect_pii_batch(texts[:1], profile=name)
+        start = time.perf_counter()
+        found = detect_pii_batch(texts, profile=name)
+        secs = time.perf_counter() - start
+        per_type = _recall(labels, found)
+        total = sum(t for t, _ in per_type.values())
+        hits = sum(h for _, h in per_type.values())
+        by_type = ", ".join(f"{t}={h / n:.2f}" for t, (n, h) in sorted(per_type.items()))
+        print(f"{name:9} {doc_count / secs:8.1f} docs/s  recall={hits / total:.3f}  ({by_type})")
+
+if __name__ == "__main__":
+    main()
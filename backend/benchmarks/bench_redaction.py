@@ -0,0 +1,65 @@
+import sys
+import time
+from app.models.redaction import DetectedEntity
+from app.services.redaction import apply_redaction_with_offsets
+from benchmarks.corpus import labeled_corpus
+
+#single-pass redaction vs the old per-entity string rebuild on a dense document
+#usage: python -m benchmarks.bench_redaction [megabytes] [naive_max_kb]
+#(the old approach is O(n x k) so it only runs on a prefix of naive_max_kb)
+
+def dense_document(target_chars: int):
+    parts = []
+    entities = []
+    counts = {}
+    pos = 0
+    for text, labels in labeled_corpus(target_chars // 150 + 1):
+        for start, end, entity_type in labels:
+            counts[entity_type] = counts.get(entity_type, 0) + 1
+            entities.append(DetectedEntity(
+                entity_type=entity_type,
+                source="pii",
+                start=pos + start,
+                end=pos + end,
+                confidence=0.9,
+                original_text=text[start:end],
+                placeholder=f"[{entity_type}_{counts[entity_type]}]"
+            ))
+        parts.append(text)
+        parts.append(" ")
+        pos += len(text) + 1
+        if pos >= target_chars:
+            break
+    return "".join(parts), entities
+
+def naive_redaction(text, entities):
+    result = text
+    for entity in sorted(entities, key=lambda x: x.start, reverse=True):
+        result = result[:entity.start] + entity.placeholder + result[entity.end:]
+    return result
+
+def _time(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+def main():
+    megabytes = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+    naive_max_kb = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    text, entities = dense_document(int(megabytes * 1_000_000))
+    (redacted, offsets), secs = _time(apply_redaction_with_offsets, text, entities)
+    print(f"chars={len(text)} entities={len(entities)}")
+    print(f"single-pass {secs * 1000:9.1f} ms  ({len(offsets)} offset spans)")
+    prefix = naive_max_kb * 1000
+    sub_entities = [e for e in entities if e.end <= prefix]
+    sub_text = text[:prefix]
+    expected, fast_secs = _time(lambda: apply_redaction_with_offsets(sub_text, sub_entities)[0])
+    naive, naive_secs = _time(naive_redaction, sub_text, sub_entities)
+    assert naive == expected
+    print(
+        f"{naive_max_kb} KB prefix, {len(sub_entities)} entities: "
+        f"naive {naive_secs * 1000:.1f} ms vs single-pass {fast_secs * 1000:.1f} ms"
+    )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+import sys
+import time
+from app.services.sanitizer import detect_pii, is_prose, load_profile, _paragraph_bounds
+from benchmarks.bench_profiles import _recall
+from benchmarks.corpus import mixed_corpus
+
+#full NER over everything vs tiered (NER only on prose paragraphs)
+#usage: python -m benchmarks.bench_tiered [doc_count]
+
+def main():
+    doc_count = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    corpus = mixed_corpus(doc_count)
+    texts = [text for text, _ in corpus]
+    labels = [sample_labels for _, sample_labels in corpus]
+    total_chars = sum(len(t) for t in texts)
+    prose_chars = sum(e - s for t in texts for s, e in _paragraph_bounds(t) if is_prose(t[s:e]))
+    print(f"docs={doc_count} chars={total_chars} routed to NER in tiered mode: {prose_chars / total_chars:.1%}")
+    for name in ("accurate", "tiered"):
+        load_profile(name)
+        detect_pii(texts[0], profile=name)
+        start = time.perf_counter()
+        found = [detect_pii(text, profile=name) for text in texts]
+        secs = time.perf_counter() - start
+        per_type = _recall(labels, found)
+        total = sum(t for t, _ in per_type.values())
+        hits = sum(h for _, h in per_type.values())
+        by_type = ", ".join(f"{t}={h / n:.2f}" for t, (n, h) in sorted(per_type.items()))
+        print(f"{name:9} {doc_count / secs:8.1f} docs/s  recall={hits / total:.3f}  ({by_type})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import random
+from typing import List, Tuple
+
+#synthetic labeled corpus for benchmarks (no real data)
+#each sample is (text, [(start, end, entity_type), ...])
+LabeledSample = Tuple[str, List[Tuple[int, int, str]]]
+
+FIRST_NAMES = ["John", "Maria", "Wei", "Aisha", "Carlos", "Emma", "Raj", "Olga"]
+LAST_NAMES = ["Smith", "Garcia", "Chen", "Khan", "Lopez", "Brown", "Patel", "Ivanova"]
+CITIES = ["Chicago", "Boston", "Denver", "Seattle", "Austin", "Miami"]
+FILLER = [
+    "The quarterly review covered budget, hiring and the roadmap for next year.",
+    "Please find the attached summary of action items from the meeting.",
+    "All figures are preliminary and subject to change after the audit.",
+    "The team agreed to revisit the proposal once legal has signed off.",
+]
+SSNS = ["219-09-9999", "536-22-8726", "457-55-5462"]
+
+def _sample(rng: random.Random) -> LabeledSample:
+    parts: List[str] = []
+    labels: List[Tuple[int, int, str]] = []
+    pos = 0
+    def add(chunk: str, entity_type: str = ""):
+        nonlocal pos
+        if entity_type:
+            labels.append((pos, pos + len(chunk), entity_type))
+        parts.append(chunk)
+        pos += len(chunk)
+    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    add(rng.choice(FILLER) + " Contact ")
+    add(f"{first} {last}", "PERSON")
+    add(" at ")
+    add(f"{first.lower()}.{last.lower()}@example.com", "EMAIL_ADDRESS")
+    add(" from the ")
+    add(rng.choice(CITIES), "LOCATION")
+    add(" office. SSN: ")
+    add(rng.choice(SSNS), "US_SSN")
+    add(". " + rng.choice(FILLER))
+    return "".join(parts), labels
+
+def labeled_corpus(size: int, seed: int = 7) -> List[LabeledSample]:
+    rng = random.Random(seed)
+    return [_sample(rng) for _ in range(size)]
+
+def texts(size: int, seed: int = 7) -> List[str]:
+    return [text for text, _ in labeled_corpus(size, seed)]
+
+def _table_block(rng: random.Random, rows: int) -> str:
+    lines = ["id,amount,quantity,date"]
+    for i in range(rows):
+        lines.append(f"{i},{rng.randint(100, 99999) / 100},{rng.randint(1, 500)},2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}")
+    return "\n".join(lines)
+
+CODE_BLOCK = "def total(rows):\n    return sum(r['amount'] for r in rows if r['qty'] > 0)"
+
+def mixed_corpus(size: int, table_rows: int = 40, seed: int = 7) -> List[LabeledSample]:
+    #prose with labeled PII followed by a numeric table and a code block
+    #(the table ends with an SSN the regex tier must still catch)
+    rng = random.Random(seed)
+    samples = []
+    for _ in range(size):
+        text, labels = _sample(rng)
+        table = _table_block(rng, table_rows)
+        ssn = rng.choice(SSNS)
+        text = f"{text}\n\n{table}\n{table_rows},{ssn},0,2024-01-01"
+        start = text.rindex(ssn)
+        labels = labels + [(start, start + len(ssn), "US_SSN")]
+        samples.append((f"{text}\n\n{CODE_BLOCK}", labels))
+    return samples
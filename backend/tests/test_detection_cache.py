@@ -0,0 +1,45 @@
+import pytest
+from app.services import detection_cache
+
+@pytest.fixture(autouse=True)
+def clean_cache():
+    detection_cache.clear()
+    yield
+    detection_cache.clear()
+
+def test_normalize_bounds_trims_whitespace():
+    text = "\n  Best regards,\n  Jane  \n"
+    start, end = detection_cache.normalize_bounds(text, 0, len(text))
+    assert text[start:end] == "Best regards,\n  Jane"
+
+def test_key_depends_on_profile_and_version(monkeypatch):
+    key = detection_cache.make_key("footer", "accurate")
+    assert key == detection_cache.make_key("footer", "accurate")
+    assert key != detection_cache.make_key("footer", "fast")
+    monkeypatch.setattr(detection_cache, "DETECTOR_VERSION", "next")
+    assert key != detection_cache.make_key("footer", "accurate")
+
+def test_key_depends_on_language():
+    assert detection_cache.make_key("footer", "accurate", "en") != detection_cache.make_key("footer", "accurate", "de")
+
+def test_hit_miss_stats():
+    key = detection_cache.make_key("footer", "accurate")
+    assert detection_cache.get(key) is None
+    detection_cache.put(key, ((0, 4, "PERSON", 0.85),))
+    assert detection_cache.get(key) == ((0, 4, "PERSON", 0.85),)
+    stats = detection_cache.get_stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_rate"] == 0.5
+    assert stats["size"] == 1
+
+def test_lru_eviction(monkeypatch):
+    monkeypatch.setattr(detection_cache, "PII_CACHE_SIZE", 2)
+    detection_cache.put("a", ())
+    detection_cache.put("b", ())
+    #touch a so b is least recently used
+    detection_cache.get("a")
+    detection_cache.put("c", ())
+    assert detection_cache.get("b") is None
+    assert detection_cache.get("a") == ()
+    assert detection_cache.get_stats()["evictions"] == 1
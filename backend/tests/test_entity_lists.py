@@ -0,0 +1,80 @@
+import pytest
+from pydantic import ValidationError
+from app.models.entity_lists import DenyTerm, EntityLists
+from app.services import entity_lists
+from app.services.entity_lists import TermAutomaton
+from app.services.redaction import generate_redaction_map, merge_entities, reverse_redaction
+from app.services.sanitizer import PIIEntity
+
+@pytest.fixture(autouse=True)
+def clean_lists():
+    entity_lists.clear_entity_lists()
+    yield
+    entity_lists.clear_entity_lists()
+
+def _matches(automaton, text):
+    return [(text[s:e], payload) for s, e, payload in automaton.find(text)]
+
+def test_automaton_finds_overlapping_terms():
+    automaton = TermAutomaton()
+    automaton.add("acme", (False, ""))
+    automaton.add("acme corp", (False, ""))
+    automaton.add("corp ltd", (True, "ORG"))
+    automaton.build()
+    assert _matches(automaton, "Acme Corp Ltd") == [
+        ("Acme", (False, "")),
+        ("Acme Corp", (False, "")),
+        ("Corp Ltd", (True, "ORG")),
+    ]
+
+def test_automaton_case_insensitive_whole_words():
+    automaton = TermAutomaton()
+    automaton.add("Bluebird", (True, "PROJECT"))
+    automaton.build()
+    assert _matches(automaton, "project BLUEBIRD ships; bluebirds fly") == [("BLUEBIRD", (True, "PROJECT"))]
+
+def test_no_lists_is_noop():
+    assert entity_lists.find_terms("anything") == ([], [])
+
+def test_allow_list_suppresses_entities():
+    text = "Write to support@acme.com or john@example.com"
+    pii = [
+        PIIEntity(entity_type="EMAIL_ADDRESS", start=9, end=25, score=0.95, text="support@acme.com"),
+        PIIEntity(entity_type="EMAIL_ADDRESS", start=29, end=45, score=0.95, text="john@example.com"),
+    ]
+    entity_lists.set_entity_lists(EntityLists(allow=["support@acme.com"]))
+    merged = merge_entities(pii, [], text)
+    assert [e.original_text for e in merged] == ["john@example.com"]
+    #without text the lists are not applied
+    assert len(merge_entities(pii, [])) == 2
+
+def test_allow_list_suppresses_entities_inside_value():
+    text = "Office: 1 Main Street, Springfield"
+    pii = [PIIEntity(entity_type="LOCATION", start=23, end=34, score=0.85, text="Springfield")]
+    entity_lists.set_entity_lists(EntityLists(allow=["1 Main Street, Springfield"]))
+    assert merge_entities(pii, [], text) == []
+
+def test_deny_list_forces_entities():
+    text = "Status of Bluebird: on track. Ask Jane about bluebird."
+    pii = [PIIEntity(entity_type="PERSON", start=34, end=38, score=0.85, text="Jane")]
+    entity_lists.set_entity_lists(EntityLists(deny=[DenyTerm(term="Bluebird", entity_type="PROJECT")]))
+    redaction_map = generate_redaction_map(text, pii, [])
+    assert [e.entity_type for e in redaction_map.entities] == ["PROJECT", "PERSON", "PROJECT"]
+    assert "Bluebird" not in redaction_map.redacted_text
+    assert "bluebird" not in redaction_map.redacted_text
+
+def test_deny_wins_overlap():
+    text = "Codename Bluebird Smith"
+    pii = [PIIEntity(entity_type="PERSON", start=9, end=23, score=0.85, text="Bluebird Smith")]
+    entity_lists.set_entity_lists(EntityLists(deny=[DenyTerm(term="bluebird")]))
+    merged = merge_entities(pii, [], text)
+    assert [(e.entity_type, e.original_text) for e in merged] == [("DENY_LIST", "Bluebird")]
+
+def test_deny_entity_type_must_be_placeholder_safe():
+    #"[Project Code_1]" would never be restored by reverse_redaction
+    with pytest.raises(ValidationError):
+        DenyTerm(term="Bluebird", entity_type="Project Code")
+    text = "Ship Bluebird now"
+    entity_lists.set_entity_lists(EntityLists(deny=[DenyTerm(term="Bluebird", entity_type="PROJECT_CODE")]))
+    redaction_map = generate_redaction_map(text, [], [])
+    assert reverse_redaction(redaction_map.redacted_text, redaction_map.entities) == text
@@ -0,0 +1,55 @@
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services import warmup
+
+client = TestClient(app)
+
+@pytest.fixture(autouse=True)
+def reset_warmup():
+    warmup.reset()
+    yield
+    warmup.reset()
+
+def test_health_is_live_before_warmup():
+    response = client.get("/health")
+    assert response.status_code == 200
+    assert response.json() == {"status": "ok", "ready": False}
+
+def test_ready_returns_503_before_warmup():
+    response = client.get("/ready")
+    assert response.status_code == 503
+    data = response.json()
+    assert data["ready"] is False
+    assert data["components"]["analyzer"]["state"] == "pending"
+    assert data["components"]["secret_patterns"]["state"] == "pending"
+
+def test_ready_after_warmup():
+    warmup.warm_up()
+    response = client.get("/ready")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["ready"] is True
+    for status in data["components"].values():
+        assert status["state"] == "ready"
+        assert status["load_seconds"] is not None
+    assert client.get("/health").json()["ready"] is True
+
+def test_warmup_failure_reported(monkeypatch):
+    def broken():
+        raise RuntimeError("model missing")
+    monkeypatch.setattr(warmup, "detect_pii", lambda text: broken())
+    warmup.warm_up()
+    status = warmup.get_component_status()
+    assert status["analyzer"].state == "error"
+    assert "model missing" in status["analyzer"].error
+    assert status["secret_patterns"].state == "ready"
+    assert not warmup.is_ready()
+
+def test_memory_usage_endpoint():
+    response = client.get("/health/memory", params={"documents": True})
+    assert response.status_code == 200
+    data = response.json()
+    assert set(data["stores"]) == {"file_bytes", "extract_bytes", "sanitized_bytes", "total"}
+    assert "total" in data["gate"]
+    assert isinstance(data["documents"], list)
@@ -0,0 +1,89 @@
+import pytest
+from app.services import language_router, sanitizer
+
+@pytest.fixture(autouse=True)
+def fresh_router():
+    language_router.clear()
+    yield
+    language_router.clear()
+
+def test_detect_language_english():
+    text = "The patient was admitted to the clinic on Monday and is expected to be discharged soon."
+    assert language_router.detect_language(text) == "en"
+
+def test_detect_language_german():
+    text = "Der Patient ist nicht mit dem Auto gekommen, sondern mit der Bahn und auch zu spät."
+    assert language_router.detect_language(text) == "de"
+
+def test_detect_language_spanish():
+    text = "El paciente llegó a la clínica con su familia y no quiso hablar con los médicos del hospital."
+    assert language_router.detect_language(text) == "es"
+
+def test_detect_language_falls_back_to_default():
+    assert language_router.detect_language("") == "en"
+    assert language_router.detect_language("SSN 219-09-9999") == "en"
+
+def test_estimate_model_mb():
+    assert language_router.estimate_model_mb("en_core_web_lg") == 800
+    assert language_router.estimate_model_mb("de_core_news_sm") == 50
+    assert language_router.estimate_model_mb("custom") == language_router.DEFAULT_MODEL_SIZE_MB
+
+def test_unknown_language_raises():
+    with pytest.raises(ValueError):
+        language_router.get_analyzer("xx")
+
+def test_analyzers_cached_per_language(monkeypatch):
+    built = []
+    monkeypatch.setattr(language_router, "_build_analyzer", lambda lang, model, excluded: built.append(lang) or object())
+    first = language_router.get_analyzer("de")
+    assert language_router.get_analyzer("de") is first
+    assert language_router.get_analyzer("fr") is not first
+    assert built == ["de", "fr"]
+
+def test_lru_eviction_over_budget(monkeypatch):
+    monkeypatch.setattr(language_router, "_build_analyzer", lambda lang, model, excluded: object())
+    monkeypatch.setattr(language_router, "MODEL_MEMORY_BUDGET_MB", 1600)
+    language_router.get_analyzer("de")
+    language_router.get_analyzer("fr")
+    #touch de so fr is the least recently used
+    language_router.get_analyzer("de")
+    language_router.get_analyzer("es")
+    loaded = [entry["language"] for entry in language_router.list_loaded()]
+    assert loaded == ["de", "es"]
+    stats = language_router.get_stats()
+    assert stats["evictions"] == 1
+    assert stats["estimated_mb"] <= stats["budget_mb"]
+
+def test_requested_model_never_evicted(monkeypatch):
+    monkeypatch.setattr(language_router, "_build_analyzer", lambda lang, model, excluded: object())
+    monkeypatch.setattr(language_router, "MODEL_MEMORY_BUDGET_MB", 100)
+    analyzer = language_router.get_analyzer("de")
+    assert [entry["language"] for entry in language_router.list_loaded()] == ["de"]
+    assert language_router.get_analyzer("de") is analyzer
+
+def _stub_analyzers(monkeypatch, built):
+    class StubAnalyzer:
+        def analyze(self, text, language, entities=None, **kwargs):
+            return []
+    def build(lang, model, excluded):
+        built.append(lang)
+        return StubAnalyzer()
+    monkeypatch.setattr(language_router, "_build_analyzer", build)
+
+GERMAN = "Der Patient ist nicht mit dem Auto gekommen, sondern mit der Bahn und auch zu spät."
+
+def test_auto_language_routes_to_detected_model(monkeypatch):
+    built = []
+    _stub_analyzers(monkeypatch, built)
+    monkeypatch.setattr(language_router, "is_installed", lambda language: True)
+    sanitizer.detect_pii(GERMAN, language="auto")
+    assert built == ["de"]
+
+def test_auto_language_falls_back_without_model(monkeypatch):
+    built = []
+    _stub_analyzers(monkeypatch, built)
+    monkeypatch.setattr(language_router.spacy.util, "is_package", lambda name: name == "en_core_web_lg")
+    assert not language_router.is_installed("de")
+    assert language_router.route_language(GERMAN) == "en"
+    sanitizer.detect_pii(GERMAN, language="auto")
+    assert built == ["en"]
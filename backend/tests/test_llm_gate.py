@@ -7,6 +7,9 @@ from app.core.llm_gate import (
     validate_text,
     clear_registry,
     get_registry_stats,
+    get_registry_bytes,
+    get_document_registry_bytes,
+    unregister_document,
     GateResult
 )
 from app.services.sanitizer import detect_pii
@@ -55,6 +58,44 @@ class TestDocumentRegistration:
         stats = get_registry_stats()
         assert stats["redaction_placeholders"] == 2
 
+    def test_registry_bytes_counted_once(self):
+        register_document_content(DOCUMENT_TEXT)
+        size = get_registry_bytes()
+        assert size["document_hashes"] == 64
+        assert size["document_substrings"] > len(DOCUMENT_TEXT)
+        register_document_content(DOCUMENT_TEXT)
+        register_redaction_placeholder("[EMAIL_ADDRESS_1]")
+        register_redaction_placeholder("[EMAIL_ADDRESS_1]")
+        assert get_registry_bytes()["document_substrings"] == size["document_substrings"]
+        assert get_registry_bytes()["redaction_placeholders"] == len("[EMAIL_ADDRESS_1]")
+        clear_registry()
+        assert get_registry_bytes()["total"] == 0
+
+    def test_registry_bytes_per_document(self):
+        register_document_content(DOCUMENT_TEXT, doc_id="a")
+        register_redaction_placeholder("[EMAIL_ADDRESS_1]", "a")
+        alone = get_registry_bytes()
+        assert get_document_registry_bytes("a") == alone
+        #the same text under another document is counted for it, not again in total
+        register_document_content(DOCUMENT_TEXT, doc_id="b")
+        assert get_registry_bytes() == alone
+        assert get_document_registry_bytes("b")["document_substrings"] == alone["document_substrings"]
+        unregister_document("a")
+        assert get_document_registry_bytes("a")["total"] == 0
+        assert get_registry_bytes()["redaction_placeholders"] == 0
+        assert not validate_text(DOCUMENT_TEXT).allowed
+        unregister_document("b")
+        assert get_registry_bytes()["total"] == 0
+        assert validate_text(DOCUMENT_TEXT[:60], "summary").allowed
+
+    def test_unregister_keeps_fingerprints_registered_without_document(self):
+        register_document_content(DOCUMENT_TEXT)
+        size = get_registry_bytes()
+        register_document_content(DOCUMENT_TEXT, doc_id="a")
+        unregister_document("a")
+        assert get_registry_bytes() == size
+        assert not validate_text(DOCUMENT_TEXT).allowed
+
 class TestPoisonPayloadRejection:
     def test_exact_document_match_rejected(self):
         register_document_content(DOCUMENT_TEXT)
@@ -1,9 +1,12 @@
 import pytest
-from app.services import memory_manager, file_handler
+from app.services import memory_manager, file_handler, spill_store
 from app.services.memory_manager import DocumentState
 
 @pytest.fixture(autouse=True)
 def clean_state():
+    #no session key: evicted documents are dropped, not spilled
+    #(an unlock in another test module leaves one set)
+    spill_store.clear_session_key()
     file_handler.clear_all()
     memory_manager.clear_all()
     yield
@@ -107,3 +110,169 @@ def test_memory_stats():
     assert stats["file_contents_count"] == 2
     assert stats["raw_extracts_count"] == 1
     assert stats["document_states_count"] == 2
+
+def _sanitize(doc_id, text):
+    from app.services.redaction import generate_redaction_record
+    memory_manager.store_sanitized_content(doc_id, generate_redaction_record(text, [], []))
+    memory_manager.transition_state(doc_id, DocumentState.SANITIZED)
+
+def test_bytes_tracked_per_document():
+    memory_manager.store_raw_extract("doc1", {"text": "a" * 100})
+    file_handler._file_contents["doc1"] = b"x" * 50
+    memory_manager.account_document("doc1")
+    assert memory_manager.get_memory_stats()["tracked_bytes"] == memory_manager.document_bytes("doc1")
+    assert memory_manager.document_bytes("doc1") >= 150
+    memory_manager.cleanup_document("doc1")
+    assert memory_manager.get_memory_stats()["tracked_bytes"] == 0
+
+def test_lru_finished_documents_evicted(monkeypatch):
+    monkeypatch.setattr(memory_manager, "MEMORY_BUDGET_BYTES", 2500)
+    for doc_id in ("old", "mid", "new"):
+        _sanitize(doc_id, doc_id[0] * 1000)
+    #"old" was least recently used; reading "mid" keeps it over "new"
+    assert memory_manager.get_document_state("old") == DocumentState.EVICTED
+    assert memory_manager.get_sanitized_record("old") is None
+    memory_manager.get_sanitized_record("mid")
+    _sanitize("last", "l" * 1000)
+    assert memory_manager.get_document_state("new") == DocumentState.EVICTED
+    assert memory_manager.get_sanitized_record("mid") is not None
+    stats = memory_manager.get_memory_stats()
+    assert stats["tracked_bytes"] <= 2500
+    assert stats["evicted_count"] == 2
+
+def test_in_flight_documents_not_evicted(monkeypatch):
+    monkeypatch.setattr(memory_manager, "MEMORY_BUDGET_BYTES", 100)
+    memory_manager.set_document_state("parsing", DocumentState.PARSING)
+    memory_manager.store_raw_extract("parsing", {"text": "p" * 500})
+    _sanitize("done", "d" * 500)
+    #over budget, but the only other document is still being processed
+    assert memory_manager.get_raw_extract("parsing") is not None
+    assert memory_manager.get_document_state("done") == DocumentState.SANITIZED
+    memory_manager.store_raw_extract("parsing", {"text": "p" * 600})
+    assert memory_manager.get_document_state("done") == DocumentState.EVICTED
+    assert memory_manager.get_document_state("parsing") == DocumentState.PARSING
+
+def test_evicted_status_visible_on_document(monkeypatch):
+    monkeypatch.setattr(memory_manager, "MEMORY_BUDGET_BYTES", 100)
+    doc = file_handler.store_document("a.txt", b"hello", ".txt")
+    memory_manager.transition_state(doc.document_id, DocumentState.COMPLETED)
+    file_handler.store_document("b.txt", b"b" * 200, ".txt")
+    assert file_handler.get_document(doc.document_id).status == "evicted"
+    assert file_handler.get_file_content(doc.document_id) is None
+
+def test_memory_usage_bytes_per_store_and_document():
+    file_handler._file_contents["doc1"] = b"x" * 50
+    memory_manager.store_raw_extract("doc1", {"text": "a" * 100})
+    _sanitize("doc2", "Zoë " * 100)
+    usage = memory_manager.get_memory_usage(per_document=True)
+    assert usage["stores"]["file_bytes"] == 50
+    assert usage["stores"]["extract_bytes"] >= 100
+    #latin-1 text is one byte per char; the rest is the (empty) entity table
+    record = memory_manager.get_sanitized_record("doc2")
+    assert usage["stores"]["sanitized_bytes"] == 400 + record.entities.nbytes() == record.nbytes()
+    assert [d["document_id"] for d in usage["documents"]] == ["doc2", "doc1"]
+    assert usage["documents"][0]["state"] == "sanitized"
+    assert usage["tracked_peak_bytes"] >= usage["tracked_bytes"]
+    assert "rss_peak_bytes" in usage["process"]
+    memory_manager.cleanup_document("doc2")
+    assert memory_manager.get_memory_usage()["tracked_peak_bytes"] == usage["tracked_peak_bytes"]
+
+def test_memory_usage_gate_bytes_per_document():
+    from app.core import llm_gate
+    llm_gate.clear_registry()
+    _sanitize("doc1", "a sentence long enough to be fingerprinted by the gate")
+    llm_gate.register_document_content("a sentence long enough to be fingerprinted by the gate", doc_id="doc1")
+    row = memory_manager.get_memory_usage(per_document=True)["documents"][0]
+    assert row["gate_bytes"] == llm_gate.get_document_registry_bytes("doc1")["total"] > 0
+    assert row["total_bytes"] == row["sanitized_bytes"] + row["gate_bytes"]
+    memory_manager.cleanup_document("doc1")
+    assert memory_manager.get_memory_usage(per_document=True)["documents"] == []
+    assert llm_gate.get_registry_bytes()["total"] == 0
+
+def test_identical_upload_shares_results():
+    first = file_handler.store_document("a.txt", b"same bytes", ".txt")
+    memory_manager.store_raw_extract(first.document_id, {"text": "same bytes"})
+    memory_manager.transition_state(first.document_id, DocumentState.PARSED)
+    second = file_handler.store_document("b.txt", b"same bytes", ".txt")
+    assert second.document_id != first.document_id
+    assert second.filename == "b.txt"
+    #no second copy; parse results and state are shared
+    assert second.document_id not in file_handler._file_contents
+    assert memory_manager.get_raw_extract(second.document_id) == {"text": "same bytes"}
+    assert memory_manager.get_document_state(second.document_id) == DocumentState.PARSED
+    assert file_handler.get_dedup_stats()["deduplicated_uploads"] == 1
+    #later results of the owner are visible through the re-upload
+    _sanitize(first.document_id, "same bytes")
+    assert memory_manager.get_sanitized_record(second.document_id) is memory_manager.get_sanitized_record(first.document_id)
+
+def test_shared_content_freed_with_last_reference():
+    first = file_handler.store_document("a.txt", b"same bytes", ".txt")
+    _sanitize(first.document_id, "same bytes")
+    second = file_handler.store_document("b.txt", b"same bytes", ".txt")
+    memory_manager.cleanup_document(first.document_id)
+    assert memory_manager.get_sanitized_record(second.document_id) is not None
+    memory_manager.cleanup_document(second.document_id)
+    assert memory_manager.list_sanitized_documents() == []
+    assert memory_manager.get_memory_stats()["tracked_bytes"] == 0
+    #nothing left to share: a third upload is stored again
+    third = file_handler.store_document("c.txt", b"same bytes", ".txt")
+    assert third.document_id in file_handler._file_contents
+
+def test_writing_results_detaches_reupload():
+    first = file_handler.store_document("a.txt", b"same bytes", ".txt")
+    _sanitize(first.document_id, "same bytes")
+    second = file_handler.store_document("b.txt", b"same bytes", ".txt")
+    assert memory_manager.get_document_state(second.document_id) == DocumentState.SANITIZED
+    shared = memory_manager.get_sanitized_record(first.document_id)
+    memory_manager.transition_state(second.document_id, DocumentState.SANITIZING)
+    #detached: starts from the owner's results, then diverges
+    assert memory_manager.get_sanitized_record(second.document_id) is shared
+    _sanitize(second.document_id, "other text")
+    assert memory_manager.get_sanitized_record(second.document_id).original_text == "other text"
+    assert memory_manager.get_document_state(first.document_id) == DocumentState.SANITIZED
+    assert memory_manager.get_sanitized_record(first.document_id) is shared
+
+def test_detached_reupload_keeps_file_bytes():
+    first = file_handler.store_document("a.txt", b"same bytes", ".txt")
+    second = file_handler.store_document("b.txt", b"same bytes", ".txt")
+    memory_manager.set_document_state(second.document_id, DocumentState.PARSING)
+    #still parseable after copy-on-write
+    assert file_handler.get_file_content(second.document_id) == b"same bytes"
+    memory_manager.transition_state(second.document_id, DocumentState.PARSED)
+    assert file_handler.get_file_content(first.document_id) == b"same bytes"
+
+def test_same_bytes_other_type_not_shared():
+    first = file_handler.store_document("a.csv", b"a,b\n1,2", ".csv")
+    memory_manager.store_raw_extract(first.document_id, {"text": "table"})
+    second = file_handler.store_document("b.txt", b"a,b\n1,2", ".txt")
+    assert memory_manager.get_raw_extract(second.document_id) is None
+    assert file_handler.get_file_content(second.document_id) == b"a,b\n1,2"
+
+def test_reupload_listed_for_review():
+    first = file_handler.store_document("a.txt", b"same bytes", ".txt")
+    _sanitize(first.document_id, "same bytes")
+    second = file_handler.store_document("b.txt", b"same bytes", ".txt")
+    assert memory_manager.list_sanitized_documents() == [first.document_id, second.document_id]
+    #the owner's own document is gone; its content stays for the re-upload
+    memory_manager.cleanup_document(first.document_id)
+    assert memory_manager.list_sanitized_documents() == [second.document_id]
+
+def test_evicted_content_not_reused(monkeypatch):
+    monkeypatch.setattr(memory_manager, "MEMORY_BUDGET_BYTES", 100)
+    first = file_handler.store_document("a.txt", b"a" * 60, ".txt")
+    memory_manager.transition_state(first.document_id, DocumentState.COMPLETED)
+    second = file_handler.store_document("b.txt", b"a" * 60, ".txt")
+    file_handler.store_document("c.txt", b"c" * 60, ".txt")
+    #eviction reaches every document sharing the content
+    assert file_handler.get_document(second.document_id).status == "evicted"
+    again = file_handler.store_document("d.txt", b"a" * 60, ".txt")
+    assert file_handler.get_file_content(again.document_id) == b"a" * 60
+
+def test_str_bytes_by_char_width():
+    from app.core.memory import str_bytes
+    assert str_bytes("") == 0
+    assert str_bytes("a" * 100) == 100
+    assert str_bytes("é" * 100) == 100
+    #2 and 4 byte chars (terminator included)
+    assert 200 <= str_bytes("€" * 100) <= 202
+    assert 400 <= str_bytes("😀" * 100) <= 404
@@ -0,0 +1,69 @@
+from app.models.redaction import DetectedEntity
+from app.services import memory_manager
+from app.services.offset_map import OffsetMap
+from app.services.redaction import apply_redaction_with_offsets, generate_redaction_record
+from app.services.sanitizer import PIIEntity
+
+TEXT = "Hi John, mail john@example.com now"
+
+def _entities():
+    return [
+        DetectedEntity(
+            entity_type="PERSON", source="pii", start=3, end=7,
+            confidence=0.85, original_text="John", placeholder="[PERSON_1]"
+        ),
+        DetectedEntity(
+            entity_type="EMAIL_ADDRESS", source="pii", start=14, end=30,
+            confidence=0.9, original_text="john@example.com", placeholder="[EMAIL_ADDRESS_1]"
+        ),
+    ]
+
+def _map():
+    redacted, offsets = apply_redaction_with_offsets(TEXT, _entities())
+    return redacted, OffsetMap(offsets)
+
+def test_unredacted_positions_map_both_ways():
+    redacted, offsets = _map()
+    for pos in range(len(TEXT) + 1):
+        if any(e.start < pos < e.end for e in _entities()):
+            continue
+        r = offsets.to_redacted(pos)
+        assert offsets.to_original(r) == pos
+    assert redacted[offsets.to_redacted(TEXT.index("now")):] == "now"
+
+def test_positions_inside_spans_snap():
+    _, offsets = _map()
+    assert offsets.to_redacted(5) == 3
+    assert offsets.to_redacted(5, round_up=True) == 13
+    assert offsets.to_original(8) == 3
+    assert offsets.to_original(8, round_up=True) == 7
+
+def test_range_helpers():
+    redacted, offsets = _map()
+    r_start, r_end = offsets.range_to_redacted(14, 30)
+    assert redacted[r_start:r_end] == "[EMAIL_ADDRESS_1]"
+    #a citation of "mail [EMAIL_ADDRESS_1]" maps back to the source text
+    cite = redacted.index("mail")
+    o_start, o_end = offsets.range_to_original(cite, cite + len("mail [EMAIL_ADDRESS_1]"))
+    assert TEXT[o_start:o_end] == "mail john@example.com"
+    assert [s[0] for s in offsets.spans_in_redacted(0, len(redacted))] == [3, 14]
+    assert offsets.spans_in_redacted(0, 3) == []
+
+def test_from_entities_matches_redaction():
+    _, offsets = _map()
+    rebuilt = OffsetMap.from_entities(_entities())
+    assert list(rebuilt.redacted_starts) == list(offsets.redacted_starts)
+    assert list(rebuilt.redacted_ends) == list(offsets.redacted_ends)
+
+def test_empty_map_is_identity():
+    offsets = OffsetMap()
+    assert offsets.to_redacted(5) == 5
+    assert offsets.to_original(5) == 5
+
+def test_record_keeps_offset_map():
+    memory_manager.clear_all()
+    pii = [PIIEntity(entity_type="PERSON", start=3, end=7, score=0.85, text="John")]
+    memory_manager.store_sanitized_content("doc-off", generate_redaction_record(TEXT, pii, []))
+    offsets = memory_manager.get_offset_map("doc-off")
+    assert offsets.to_redacted(len(TEXT)) == len(TEXT) + len("[PERSON_1]") - len("John")
+    memory_manager.clear_all()
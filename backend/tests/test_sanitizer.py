@@ -1,5 +1,9 @@
+import asyncio
 import pytest
-from app.services.sanitizer import detect_pii, get_analyzer, PIIEntity
+from app.services import analyzer_pool, detection_cache, sanitizer
+from app.services.sanitizer import (
+    detect_pii, detect_pii_batch, detect_pii_async, get_analyzer, is_prose, PIIEntity, _split_windows, _merge_windows
+)
 
 def test_detect_email():
     text = "Contact me at john.doe@example.com"
@@ -45,3 +49,218 @@ def test_analyzer_singleton():
     analyzer1 = get_analyzer()
     analyzer2 = get_analyzer()
     assert analyzer1 is analyzer2
+
+def test_detect_pii_batch_matches_single():
+    texts = [
+        "Contact me at john.doe@example.com",
+        "The quick brown fox jumps over the lazy dog",
+        "SSN: 219-09-9999"
+    ]
+    batched = detect_pii_batch(texts, batch_size=2)
+    assert len(batched) == len(texts)
+    for text, entities in zip(texts, batched):
+        single = detect_pii(text)
+        assert [(e.entity_type, e.start, e.end) for e in entities] == [(e.entity_type, e.start, e.end) for e in single]
+
+def test_detect_pii_batch_offsets_per_text():
+    texts = ["a@example.com", "Email: b@example.com"]
+    batched = detect_pii_batch(texts)
+    emails = [[e for e in ents if e.entity_type == "EMAIL_ADDRESS"] for ents in batched]
+    assert emails[0][0].text == "a@example.com"
+    assert emails[1][0].text == "b@example.com"
+    assert emails[1][0].start == 7
+
+def test_detect_pii_batch_empty():
+    assert detect_pii_batch([]) == []
+
+def test_split_windows_short_text_single_window():
+    assert _split_windows("short text", 100, 10) == [(0, 10)]
+
+def test_split_windows_overlap_and_coverage():
+    text = "".join(f"Sentence number {i} is here. " for i in range(200))
+    windows = _split_windows(text, 500, 50)
+    assert windows[0][0] == 0
+    assert windows[-1][1] == len(text)
+    for (_, prev_end), (start, end) in zip(windows, windows[1:]):
+        #neighbours overlap and every window stays within budget
+        assert start < prev_end
+        assert end - start <= 500
+    #windows are cut after sentence ends
+    assert all(text[end - 1] == "." for _, end in windows[:-1])
+
+def test_merge_windows_drops_span_cut_by_window_edge():
+    #no whitespace in the overlap: window 1 cuts the token at its end
+    text = "x" * 10 + "TOKENVALUE" + " tail"
+    #windows (0, 15) and (10, 25)
+    cut = PIIEntity(entity_type="ID", start=10, end=15, score=0.9, text=text[10:15])
+    whole = PIIEntity(entity_type="ID", start=10, end=20, score=0.9, text=text[10:20])
+    assert _merge_windows([[cut], [whole]]) == [whole]
+    #window 2 alone cut it: still the only copy, kept
+    assert _merge_windows([[], [cut]]) == [cut]
+
+def test_merge_windows_keeps_name_straddling_space_break():
+    #window 1 ends at the space inside the name and reports the first name;
+    #window 2 starts at the name and reports it whole
+    text = "Report by John Smith today"
+    #windows (0, 15) and (10, 26)
+    first = PIIEntity(entity_type="PERSON", start=10, end=14, score=0.85, text="John")
+    full = PIIEntity(entity_type="PERSON", start=10, end=20, score=0.85, text="John Smith")
+    assert _merge_windows([[first], [full]]) == [full]
+    #a span both windows found whole is reported once, with its best score
+    again = PIIEntity(entity_type="PERSON", start=10, end=20, score=0.9, text="John Smith")
+    assert _merge_windows([[full], [again]]) == [again]
+
+def test_merge_windows_keeps_nested_spans_from_one_window():
+    outer = PIIEntity(entity_type="URL", start=0, end=20, score=0.6, text="x" * 20)
+    inner = PIIEntity(entity_type="EMAIL_ADDRESS", start=5, end=15, score=1.0, text="x" * 10)
+    assert _merge_windows([[outer, inner]]) == [outer, inner]
+
+def test_windowed_detection_matches_offsets(monkeypatch):
+    monkeypatch.setattr(sanitizer, "MAX_WINDOW_CHARS", 400)
+    monkeypatch.setattr(sanitizer, "WINDOW_OVERLAP", 80)
+    text = "".join(f"Write to user{i}@example.com about the report.\n\n" for i in range(40))
+    entities = detect_pii(text)
+    emails = [e for e in entities if e.entity_type == "EMAIL_ADDRESS"]
+    #each address found once, with offsets into the full document
+    assert len(emails) == 40
+    for e in emails:
+        assert text[e.start:e.end] == e.text
+
+def test_analyzer_pool_matches_in_process():
+    text = "Contact me at john.doe@example.com, SSN: 219-09-9999"
+    expected = [(e.entity_type, e.start, e.end) for e in detect_pii(text)]
+    analyzer_pool.start_pool(workers=1, max_pending=2)
+    try:
+        assert analyzer_pool.is_running()
+        assert analyzer_pool.get_worker_count() == 1
+        pooled = detect_pii(text)
+        batched = detect_pii_batch([text, text], batch_size=1)
+        awaited = asyncio.run(detect_pii_async(text))
+    finally:
+        analyzer_pool.shutdown_pool()
+    assert not analyzer_pool.is_running()
+    assert analyzer_pool.get_worker_count() == 0
+    assert [(e.entity_type, e.start, e.end) for e in pooled] == expected
+    assert all([(e.entity_type, e.start, e.end) for e in ents] == expected for ents in batched)
+    assert [(e.entity_type, e.start, e.end) for e in awaited] == expected
+
+def test_cancelled_async_call_returns_its_slot():
+    analyzer_pool.start_pool(workers=1, max_pending=1)
+    slots = analyzer_pool._slots
+    async def cancel_waiting_call():
+        #the only slot is taken, so the call waits for one
+        slots.acquire()
+        task = asyncio.create_task(detect_pii_async("Contact me at john.doe@example.com"))
+        await asyncio.sleep(0.1)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        slots.release()
+        #the waiting thread takes the freed slot, then hands it back
+        for _ in range(50):
+            await asyncio.sleep(0.02)
+            if slots.acquire(blocking=False):
+                return True
+        return False
+    try:
+        assert asyncio.run(cancel_waiting_call())
+        slots.release()
+    finally:
+        analyzer_pool.shutdown_pool()
+
+def test_pooled_cache_stats_reported():
+    #lookups happen in the worker; their counters still reach the stats
+    detection_cache.clear()
+    text = "Contact me at john.doe@example.com"
+    analyzer_pool.start_pool(workers=1, max_pending=2)
+    try:
+        detect_pii(text, use_cache=True)
+        detect_pii(text, use_cache=True)
+    finally:
+        analyzer_pool.shutdown_pool()
+    stats = detection_cache.get_stats()
+    assert stats["hits"] == 1 and stats["misses"] == 1
+    assert stats["workers"] == 1
+    detection_cache.clear()
+
+def test_detect_pii_async_in_process():
+    entities = asyncio.run(detect_pii_async("Contact me at john.doe@example.com"))
+    assert any(e.entity_type == "EMAIL_ADDRESS" for e in entities)
+
+def test_unknown_profile_rejected():
+    with pytest.raises(ValueError):
+        detect_pii("text", profile="nonexistent")
+
+def test_fast_profile_regex_only():
+    text = "Contact John Smith at john.doe@example.com, SSN: 219-09-9999"
+    entities = detect_pii(text, profile="fast")
+    types = {e.entity_type for e in entities}
+    assert "EMAIL_ADDRESS" in types
+    assert "US_SSN" in types
+    #no NER in the fast profile
+    assert "PERSON" not in types
+    with pytest.raises(ValueError):
+        get_analyzer("fast")
+
+def test_balanced_profile_limits_entities():
+    text = "John Smith (john.doe@example.com) visited https://example.org on 2024-01-01"
+    entities = detect_pii(text, profile="balanced")
+    allowed = set(sanitizer.PROFILES["balanced"].entities)
+    assert all(e.entity_type in allowed for e in entities)
+    assert any(e.entity_type == "EMAIL_ADDRESS" for e in entities)
+    assert "parser" not in get_analyzer("balanced").nlp_engine.nlp["en"].pipe_names
+
+def test_profile_analyzers_cached_separately():
+    assert get_analyzer("accurate") is get_analyzer("accurate")
+    assert get_analyzer("accurate") is not get_analyzer("balanced")
+
+def test_batch_with_profile():
+    texts = ["Mail a@example.com", "SSN: 219-09-9999"]
+    batched = detect_pii_batch(texts, profile="fast")
+    assert [e.entity_type for e in batched[0]] == [e.entity_type for e in detect_pii(texts[0], profile="fast")]
+
+def test_cached_detection_reuses_repeated_paragraphs():
+    detection_cache.clear()
+    footer = "Questions? Email support@example.com"
+    text = f"First update.\n\n{footer}\n\nSecond update.\n\n{footer}"
+    entities = detect_pii(text, use_cache=True)
+    emails = [e for e in entities if e.entity_type == "EMAIL_ADDRESS"]
+    assert len(emails) == 2
+    for e in emails:
+        assert text[e.start:e.end] == "support@example.com"
+    #the same footer in a new document is served from the cache
+    detect_pii(f"Other doc.\n\n{footer}", use_cache=True)
+    assert detection_cache.get_stats()["hits"] >= 1
+    detection_cache.clear()
+
+def test_is_prose_classifier():
+    assert is_prose("The quarterly review covered budget, hiring and the roadmap.")
+    assert is_prose("Contact John Smith at john.smith@example.com today.")
+    assert not is_prose("id,amount,date\n1,200.50,2024-01-01\n2,300,2024-01-02")
+    assert not is_prose("def f(x):\n    return {x: x + 1}")
+    assert not is_prose("NAME ADDRESS PHONE EMAIL")
+    assert not is_prose("")
+
+def test_tiered_profile_skips_ner_outside_prose(monkeypatch):
+    analyzed = []
+    analyzer = get_analyzer("tiered")
+    original = analyzer.analyze
+    def spy(text, **kwargs):
+        analyzed.append(text)
+        return original(text=text, **kwargs)
+    monkeypatch.setattr(analyzer, "analyze", spy)
+    prose = "Please email John Smith at john.smith@example.com about the audit."
+    table = "id,ssn,amount\n1,219-09-9999,200\n2,536-22-8726,300"
+    text = f"{prose}\n\n{table}"
+    entities = detect_pii(text, profile="tiered")
+    #only the prose paragraph reached the NLP analyzer
+    assert analyzed == [prose]
+    types = {e.entity_type for e in entities}
+    assert "EMAIL_ADDRESS" in types
+    ssns = [e for e in entities if e.entity_type == "US_SSN"]
+    assert {e.text for e in ssns} == {"219-09-9999", "536-22-8726"}
+    for e in entities:
+        assert text[e.start:e.end] == e.text
+
+def test_tiered_profile_shares_accurate_model():
+    assert get_analyzer("tiered") is get_analyzer("accurate")
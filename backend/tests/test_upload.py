@@ -131,3 +131,42 @@ def test_content_stored_in_memory():
     assert doc_id in _file_contents
     assert _file_contents[doc_id] == content
     assert doc_id in _documents
+
+def test_upload_hashed_in_chunks(monkeypatch):
+    #content spanning several chunks hashes the same as a one-shot hash
+    from app.api import documents
+    from app.services.file_handler import compute_sha256
+    monkeypatch.setattr(documents, "UPLOAD_CHUNK_BYTES", 7)
+    content = b"chunked upload content " * 10
+    response = client.post("/api/documents/upload", files={"file": ("c.txt", io.BytesIO(content), "text/plain")})
+    assert response.status_code == 200
+    doc_id = response.json()["document_id"]
+    assert response.json()["sha256"] == compute_sha256(content)
+    assert _file_contents[doc_id] == content
+
+def test_upload_too_large(monkeypatch):
+    from app.api import documents
+    monkeypatch.setattr(documents, "MAX_UPLOAD_BYTES", 10)
+    response = client.post("/api/documents/upload", files={"file": ("big.txt", io.BytesIO(b"x" * 11), "text/plain")})
+    assert response.status_code == 413
+    assert len(_documents) == 0
+
+def test_upload_conflicting_magic_rejected():
+    #an executable renamed to .pdf
+    content = b"MZ\x90\x00\x03\x00\x00\x00 rest of binary"
+    response = client.post("/api/documents/upload", files={"file": ("doc.pdf", io.BytesIO(content), "application/pdf")})
+    assert response.status_code == 400
+    assert "does not match" in response.json()["detail"]
+    #a real pdf renamed to .txt is also a conflict
+    response = client.post("/api/documents/upload", files={"file": ("doc.txt", io.BytesIO(b"%PDF-1.4"), "text/plain")})
+    assert response.status_code == 400
+
+def test_duplicate_upload_shares_content():
+    content = b"identical upload content"
+    r1 = client.post("/api/documents/upload", files={"file": ("a.txt", io.BytesIO(content), "text/plain")})
+    r2 = client.post("/api/documents/upload", files={"file": ("b.txt", io.BytesIO(content), "text/plain")})
+    assert r1.json()["document_id"] != r2.json()["document_id"]
+    assert r2.json()["filename"] == "b.txt"
+    #one stored copy, two documents
+    assert list(_file_contents) == [r1.json()["document_id"]]
+    assert len(_documents) == 2